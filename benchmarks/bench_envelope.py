@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Envelope encoding of a 1k row result, as returned by asyncpg and
+jsonify(), with the old dict + json path and each installed backend.
+
+    python benchmarks/bench_envelope.py
+"""
+
+import sys
+import os
+import json
+import uuid
+import decimal
+import datetime
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sanicms.encoder import EnvelopeEncoder, BACKENDS, json_default
+
+ROWS = [{
+    'id': i,
+    'create_time': datetime.datetime(2018, 1, 1, 12, 0, 0) + datetime.timedelta(seconds=i),
+    'name': 'user {}'.format(i),
+    'age': 20 + i % 50,
+    'balance': decimal.Decimal('1024.50'),
+    'token': uuid.UUID(int=i),
+    'city_id': i % 300,
+    'role_id': i % 7,
+} for i in range(1000)]
+
+PAGINATION = {'page': 1, 'count': 1000}
+NUMBER = 200
+
+
+def dict_envelope():
+    result = {'code': 0}
+    result.update({'data': ROWS, 'pagination': PAGINATION})
+    return json.dumps(result, default=json_default).encode('utf-8')
+
+
+def report(name, fn):
+    seconds = min(timeit.repeat(fn, number=NUMBER, repeat=3))
+    print('{:<24} {:>8.3f} ms/encode'.format(name, seconds / NUMBER * 1e3))
+
+
+if __name__ == '__main__':
+    report('dict envelope + json', dict_envelope)
+    for name in BACKENDS:
+        try:
+            encoder = EnvelopeEncoder(name)
+        except ImportError:
+            print('{:<24} not installed'.format(name))
+            continue
+        report('EnvelopeEncoder ' + name, lambda: encoder.encode(ROWS, PAGINATION))
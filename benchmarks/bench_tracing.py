@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Per-request tracing overhead of BasicTracer vs the sanicms Tracer.
+
+Every simulated request creates the span tree of a typical handler: the
+server span from before_request, a @logger span, a db span and a client
+span, then the reporter side converts and releases them.
+
+    python benchmarks/bench_tracing.py
+"""
+
+import sys
+import os
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from basictracer import BasicTracer
+from opentracing.ext import tags
+
+from sanicms.tracing import Tracer, recycle
+from sanicms.utils import span_to_record_v2
+
+REQUESTS = 20000
+
+
+class ListRecorder:
+    def __init__(self):
+        self.spans = []
+
+    def record_span(self, span):
+        self.spans.append(span)
+
+
+def handle(tracer):
+    root = tracer.start_span(operation_name='get_user')
+    root.log_kv({'event': 'server'})
+    root.set_tag(tags.SPAN_KIND, tags.SPAN_KIND_RPC_SERVER)
+    root.set_tag('http.url', 'http://localhost:8030/users/1')
+    root.set_tag('http.method', 'GET')
+    root.set_tag(tags.PEER_HOST_IPV4, '127.0.0.1:52000')
+
+    method = tracer.start_span(operation_name='get_city_by_id', child_of=root)
+    method.log_kv({'event': 'server'})
+
+    db = tracer.start_span(operation_name='fetch', child_of=root)
+    db.log_kv({'event': 'client'})
+    db.set_tag('component', 'db-execute')
+    db.set_tag('db.type', 'sql')
+    db.set_tag('db.sql', 'SELECT * FROM users WHERE id = $1')
+    db.set_tag('args', '1')
+    db.finish()
+
+    client = tracer.start_span(operation_name='get', child_of=method)
+    client.log_kv({'event': 'client'})
+    client.set_tag('http.url', 'http://region:8050')
+    client.set_tag('http.path', '/cities/1')
+    client.set_tag('http.method', 'GET')
+    client.set_tag('component', 'http-client')
+    client.finish()
+
+    method.set_tag('component', 'user-service-method')
+    method.finish()
+    root.set_tag('http.status_code', '200')
+    root.set_tag('component', 'user-service')
+    root.finish()
+
+
+def export(recorder):
+    for span in recorder.spans:
+        span_to_record_v2(span)
+        recycle(span)
+    recorder.spans.clear()
+
+
+def request(tracer, recorder):
+    handle(tracer)
+    export(recorder)
+
+
+def bench(name, tracer_cls, **kwargs):
+    recorder = ListRecorder()
+    tracer = tracer_cls(recorder=recorder, **kwargs)
+    for _ in range(1000):
+        request(tracer, recorder)
+
+    def request_path():
+        handle(tracer)
+        recorder.spans.clear()
+
+    handler = min(timeit.repeat(request_path, number=REQUESTS, repeat=3))
+    total = min(timeit.repeat(lambda: request(tracer, recorder),
+                              number=REQUESTS, repeat=3))
+
+    tracemalloc.start()
+    request(tracer, recorder)
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    handle(tracer)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    export(recorder)
+
+    print('{:<28} {:>8.2f} us handler {:>8.2f} us with export {:>8} B peak'.format(
+        name, handler / REQUESTS * 1e6, total / REQUESTS * 1e6, peak))
+
+
+if __name__ == '__main__':
+    bench('BasicTracer', BasicTracer)
+    bench('sanicms Tracer (no reuse)', Tracer, pool_size=0)
+    bench('sanicms Tracer', Tracer)
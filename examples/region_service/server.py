@@ -1,6 +1,7 @@
 import logging
 
 from sanicms.server import app
+from sanicms.runner import run
 from sanicms.client import Client
 
 from views import region_bp
@@ -16,4 +17,5 @@ async def index(request):
 
 
 if __name__ == '__main__':
-    app.run(host="0.0.0.0", port=app.config['PORT'], debug=True)
+    run(app, host="0.0.0.0", port=app.config['PORT'],
+        workers=app.config.get('WORKERS'), debug=True)
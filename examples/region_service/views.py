@@ -4,6 +4,8 @@ import ujson
 from sanic import Blueprint
 
 from sanicms import doc
+from sanicms.singleflight import single_flight
+from sanicms.cache import cache, invalidate
 from models import Province, City
 
 region_bp = Blueprint('region', url_prefix='regions')
@@ -14,6 +16,7 @@ region_bp = Blueprint('region', url_prefix='regions')
 @doc.description('add city')
 @doc.consumes(City)
 @doc.produces({'id': id})
+@invalidate('/regions/cities')
 async def add_city(request):
     data = request['data']
     async with request.app.db.transaction(request) as cur:
@@ -29,6 +32,8 @@ async def add_city(request):
 @region_bp.get('/cities/<id:int>', name='get_city')
 @doc.summary('get city info')
 @doc.produces(City)
+@cache(ttl=60)
+@single_flight()
 async def get_city(request, id):
     async with request.app.db.acquire(request) as cur:
         records = await cur.fetch(
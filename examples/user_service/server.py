@@ -3,6 +3,7 @@ import logging
 from views import user_bp
 
 from sanicms.server import app
+from sanicms.runner import run
 from sanicms.client import Client
 
 logger = logging.getLogger('sanic')
@@ -15,14 +16,10 @@ async def before_srver_start(app, loop):
     app.region_client =  Client('region_service', app=app)
     app.role_client = Client('role_service', app=app)
 
-@app.listener('before_server_stop')
-async def before_server_stop(app, loop):
-    app.region_client.close()
-    app.role_client.close()
-
 @app.route("/")
 async def index(request):
     return 'user service'
 
 if __name__ == '__main__':
-    app.run(host="0.0.0.0", port=app.config['PORT'], debug=True)
+    run(app, host="0.0.0.0", port=app.config['PORT'],
+        workers=app.config.get('WORKERS'), debug=True)
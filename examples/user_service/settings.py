@@ -6,6 +6,7 @@ Basic config
 APP_ID = 'user-service'
 
 HOST = os.environ.get('SERVER_HOST', None)
+WORKERS = os.environ.get('SERVER_WORKERS', 1)
 PORT = os.environ.get('SERVER_PORT', 8030)
 
 DB_CONFIG = {
@@ -29,6 +30,7 @@ ZIPKIN_SERVER = os.environ.get('ZIPKIN_SERVER', None)
 ACCESS_CONTROL_ALLOW_ORIGIN = os.environ.get("ACCESS_CONTROL_ALLOW_ORIGIN", "")
 ACCESS_CONTROL_ALLOW_HEADERS = os.environ.get("ACCESS_CONTROL_ALLOW_HEADERS", "")
 ACCESS_CONTROL_ALLOW_METHODS = os.environ.get("ACCESS_CONTROL_ALLOW_METHODS", "")
+ACCESS_CONTROL_MAX_AGE = os.environ.get("ACCESS_CONTROL_MAX_AGE", 600)
 
 CONSUL_AGENT_HOST = os.environ.get('CONSUL_AGENT_HOST', '127.0.0.1')
 CONSUL_AGENT_PORT = os.environ.get('CONSUL_AGENT_PORT', 8500)
\ No newline at end of file
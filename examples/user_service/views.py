@@ -6,6 +6,7 @@ import asyncio
 from sanic import Blueprint
 
 from sanicms import doc
+from sanicms.singleflight import single_flight
 from sanicms.utils import *
 from sanicms.exception import ServerError
 from sanicms.loggers import logger
@@ -48,13 +49,12 @@ async def create_user(request):
 @doc.summary("get user list")
 @doc.produces([User])
 async def get_users(request):
-    async with request.app.db.acquire(request) as cur:
-        records = await cur.fetch(""" SELECT * FROM users """)
-        return records
+    return request.app.db.iterate(""" SELECT * FROM users """, request=request)
 
 @user_bp.get('/<id:int>', name="get_user")
 @doc.summary("get user info")
 @doc.produces(User)
+@single_flight()
 async def get_user(request, id):
     async with request.app.db.acquire(request) as cur:
         records = await cur.fetch(
@@ -1,7 +1,8 @@
 import os
-from sanic.config import Config
 
 def load_config():
+    # imported here so that importing sanicms.startup does not load sanic
+    from sanic.config import Config
     conf  = Config()
     module = os.environ.get('SANIC_SETTINGS_MODULE', 'settings')
     if module:
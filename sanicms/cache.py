@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import hashlib
+import logging
+
+from collections import OrderedDict, defaultdict
+from urllib.parse import parse_qsl, urlencode
+
+from sanic.response import HTTPResponse, raw
+
+from sanicms.routes import get_route
+
+logger = logging.getLogger('sanic')
+
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+# GET handler -> CachePolicy set with @cache(...)
+cached_routes = {}
+
+# write handler -> path prefixes to invalidate, () for the whole blueprint
+invalidating_routes = {}
+
+
+class CachePolicy:
+    __slots__ = ('ttl', 'vary')
+
+    def __init__(self, ttl=60, vary=()):
+        self.ttl = ttl
+        self.vary = tuple(vary)
+
+
+def cache(ttl=60, vary=()):
+    """
+    Cache the encoded responses of a GET route for `ttl` seconds, keyed by
+    path, query and the `vary` headers
+    """
+    def inner(func):
+        cached_routes[func] = CachePolicy(ttl, vary)
+        return func
+    return inner
+
+
+def invalidate(*prefixes):
+    """
+    Drop cached responses once the write route succeeded: the ones under
+    its own path and `prefixes`, or every response of its blueprint when
+    no prefix is given
+    """
+    def inner(func):
+        invalidating_routes[func] = prefixes
+        return func
+    return inner
+
+
+def make_etag(body):
+    return '"{}"'.format(hashlib.sha1(body).hexdigest())
+
+
+def etag_matches(header, etag):
+    """
+    If-None-Match check, ignoring the weak prefix and the suffix the
+    compressor adds for the encoded representation
+    """
+    if header.strip() == '*':
+        return True
+    tag = etag.strip('"')
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate.strip('"').split('-', 1)[0] == tag:
+            return True
+    return False
+
+
+def not_modified(request, response):
+    """
+    304 when the client's If-None-Match matches the response's ETag
+    """
+    if request.method != 'GET' or getattr(response, 'status', None) != 200:
+        return response
+    etag = response.headers.get('ETag')
+    header = request.headers.get('If-None-Match')
+    if etag and header and etag_matches(header, etag):
+        return HTTPResponse(status=304, headers={'ETag': etag})
+    return response
+
+
+class CacheEntry:
+    __slots__ = ('expires', 'etag', 'status', 'headers', 'content_type', 'body', 'blueprint')
+
+    def __init__(self, expires, etag, status, headers, content_type, body, blueprint):
+        self.expires = expires
+        self.etag = etag
+        self.status = status
+        self.headers = headers
+        self.content_type = content_type
+        self.body = body
+        self.blueprint = blueprint
+
+
+class ResponseCache:
+    """
+    LRU of encoded GET responses bounded by `max_entries` and `max_bytes`.
+    Requests with a matching If-None-Match are answered with 304.
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024, blueprints=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # blueprint name -> ttl of its GET routes
+        self.blueprints = blueprints or {}
+        self.entries = OrderedDict()
+        self.keys = defaultdict(set)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.policies = {}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(max_entries=config.get('RESPONSE_CACHE_MAX_ENTRIES', 10000),
+                   max_bytes=config.get('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+                   blueprints=config.get('RESPONSE_CACHE_BLUEPRINTS'))
+
+    def policy(self, route):
+        try:
+            return self.policies[route.handler]
+        except KeyError:
+            pass
+        policy = cached_routes.get(route.handler)
+        if policy is None and route.blueprint in self.blueprints:
+            policy = CachePolicy(self.blueprints[route.blueprint])
+        self.policies[route.handler] = policy
+        return policy
+
+    def key(self, request, policy):
+        query = urlencode(sorted(parse_qsl(request.query_string, keep_blank_values=True)))
+        return (request.path, query) + tuple(request.headers.get(header) for header in policy.vary)
+
+    def lookup(self, request):
+        """
+        Return the cached response of the request, or None after marking
+        the request to be stored
+        """
+        if request.method != 'GET':
+            return None
+        route = get_route(request)
+        policy = self.policy(route)
+        if policy is None:
+            return None
+        key = self.key(request, policy)
+        entry = self.entries.get(key)
+        if entry is not None and entry.expires < time.monotonic():
+            self.remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            request['cache'] = (key, policy.ttl, route.blueprint)
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        header = request.headers.get('If-None-Match')
+        if header and etag_matches(header, entry.etag):
+            return HTTPResponse(status=304, headers={'ETag': entry.etag})
+        return raw(entry.body, status=entry.status, headers=dict(entry.headers),
+                   content_type=entry.content_type)
+
+    def store(self, request, response):
+        """
+        Cache the response of a request marked by lookup and tag it with its ETag
+        """
+        marked = request.get('cache')
+        if marked is None:
+            return
+        request['cache'] = None
+        if not isinstance(response, HTTPResponse) or response.status != 200:
+            return
+        key, ttl, blueprint = marked
+        etag = make_etag(response.body)
+        response.headers['ETag'] = etag
+        self.remove(key)
+        self.entries[key] = CacheEntry(time.monotonic() + ttl, etag, response.status,
+                                       dict(response.headers), response.content_type,
+                                       response.body, blueprint)
+        self.keys[blueprint].add(key)
+        self.size += len(response.body)
+        while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+            self.remove(next(iter(self.entries)))
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry.body)
+            self.keys[entry.blueprint].discard(key)
+
+    def invalidate(self, request, response):
+        """
+        Drop the cached responses a successful write route invalidates
+        """
+        if request.method not in WRITE_METHODS or getattr(response, 'status', 500) >= 400:
+            return
+        route = get_route(request)
+        prefixes = invalidating_routes.get(route.handler)
+        if prefixes is None:
+            return
+        keys = self.keys.get(route.blueprint, ())
+        if prefixes:
+            prefixes = prefixes + (request.path,)
+            keys = [key for key in keys if key[0].startswith(prefixes)]
+        for key in list(keys):
+            self.remove(key)
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'bytes': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
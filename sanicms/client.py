@@ -1,11 +1,16 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import time
 import random
 import logging
 import opentracing
 from aiohttp import ClientSession, hdrs
 
+from sanicms.tracing import start_span, is_sampled
+from sanicms.deadline import budget, forward
+from sanicms.metrics import observe_upstream
+
 logger = logging.getLogger('sanic')
 
 
@@ -16,6 +21,9 @@ class Client:
         self._client = client if client else ClientSession(loop=app.loop, **kwargs)
         self.services = app.services[self.name]
         self._url = url
+        # closed by the server once in-flight requests are drained
+        if hasattr(app, 'clients'):
+            app.clients.append(self)
 
     def handler_url(self):
         if self._url:
@@ -26,20 +34,55 @@ class Client:
 
     def cli(self, req):
         self.handler_url()
-        span = opentracing.tracer.start_span(operation_name='get', child_of=req['span'])
-        return ClientSessionConn(self._client, url=self._url, span=span)
+        return ClientSessionConn(self._client, url=self._url, span=req['span'],
+                                 deadline=req.get('deadline'), service=self.name)
 
     def close(self):
-        self._client.close()
+        return self._client.close()
+
+
+class TimedRequest:
+    """
+    Wrap aiohttp's request context manager to record the upstream latency
+    and status once the response headers arrived
+    """
+    __slots__ = ('_request', '_service')
+
+    def __init__(self, request, service):
+        self._request = request
+        self._service = service
+
+    async def _send(self, send):
+        start = time.monotonic()
+        try:
+            response = await send
+        except Exception:
+            observe_upstream(self._service, start)
+            raise
+        observe_upstream(self._service, start, response.status)
+        return response
+
+    def __await__(self):
+        return self._send(self._request).__await__()
+
+    __iter__ = __await__
+
+    def __aenter__(self):
+        return self._send(self._request.__aenter__())
+
+    def __aexit__(self, exc_type, exc, tb):
+        return self._request.__aexit__(exc_type, exc, tb)
 
 
 class ClientSessionConn:
     _client = None
 
-    def __init__(self, client, url=None, span=None, **kwargs):
+    def __init__(self, client, url=None, span=None, deadline=None, service=None, **kwargs):
         self._client = client
         self._url = url
         self._span = span
+        self._deadline = deadline
+        self._service = service or url
 
     def handler_url(self, url):
         if url.startswith("http"):
@@ -49,25 +92,35 @@ class ClientSessionConn:
         return url
 
     def before(self, method, url):
-        self._span.log_kv({'event': 'client'})
-        self._span.set_tag('http.url', self._url)
-        self._span.set_tag('http.path', url)
-        self._span.set_tag('http.method', method)
+        # one span per call, the connection can be used for several
+        if not is_sampled(self._span):
+            return None, {'ot-tracer-sampled': 'false'}
+        span = start_span(method.lower(), child_of=self._span)
+        span.log_kv({'event': 'client'})
+        span.set_tag('http.url', self._url)
+        span.set_tag('http.path', url)
+        span.set_tag('http.method', method)
         http_header_carrier = {}
         opentracing.tracer.inject(
-            self._span.context,
+            span.context,
             format=opentracing.Format.HTTP_HEADERS,
             carrier=http_header_carrier)
-        return http_header_carrier
+        return span, http_header_carrier
 
 
     def request(self, method, url, **kwargs):
-        headers = self.before(method, url)
+        # GatewayTimeout before the span is tagged, it would never finish
+        timeout = budget(self._deadline, kwargs.pop('timeout', None))
+        span, headers = self.before(method, url)
+        headers = forward(self._deadline, headers)
+        if timeout is not None:
+            kwargs['timeout'] = timeout
         res = self._client.request(method, self.handler_url(url),
                                    headers=headers, **kwargs)
-        self._span.set_tag('component', 'http-client')
-        self._span.finish()
-        return res
+        if span:
+            span.set_tag('component', 'http-client')
+            span.finish()
+        return TimedRequest(res, self._service)
 
     def get(self, url, allow_redirects=True, **kwargs):
         return self.request(hdrs.METH_GET, url, allow_redirects=True,
@@ -0,0 +1,7 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+# asyncio.Task.current_task before python 3.7
+current_task = getattr(asyncio, 'current_task', None) or asyncio.Task.current_task
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import zlib
+import asyncio
+import logging
+
+logger = logging.getLogger('sanic')
+
+# handlers opted out of compression with @compress.exempt
+exempt_handlers = set()
+
+
+def exempt(func):
+    exempt_handlers.add(func)
+    return func
+
+
+def gzip_compress(body, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(body) + compressor.flush()
+
+
+def deflate_compress(body, level):
+    return zlib.compress(body, level)
+
+
+ENCODINGS = {
+    'gzip': gzip_compress,
+    'deflate': deflate_compress,
+}
+
+
+def negotiate(accept_encoding):
+    """
+    Pick gzip or deflate from an Accept-Encoding header, None if neither
+    is acceptable
+    """
+    best, best_q = None, 0
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if coding not in ENCODINGS:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0
+        if q <= 0:
+            continue
+        # prefer gzip on equal q
+        if q > best_q or (q == best_q and coding == 'gzip'):
+            best, best_q = coding, q
+    return best
+
+
+class Compressor:
+    """
+    Compress response bodies of at least `min_size` bytes with the encoding
+    negotiated from Accept-Encoding. Bodies of `offload_size` bytes or more
+    are compressed in the default executor.
+    """
+
+    def __init__(self, level=6, min_size=1024, offload_size=256 * 1024):
+        self.level = level
+        self.min_size = min_size
+        self.offload_size = offload_size
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(level=config.get('COMPRESS_LEVEL', 6),
+                   min_size=config.get('COMPRESS_MIN_SIZE', 1024),
+                   offload_size=config.get('COMPRESS_OFFLOAD_SIZE', 256 * 1024))
+
+    async def compress(self, request, response):
+        body = getattr(response, 'body', None)
+        if not body or len(body) < self.min_size:
+            return response
+        if 'Content-Encoding' in response.headers:
+            return response
+        route = request.get('route')
+        if route is not None and not route.compress:
+            return response
+        encoding = negotiate(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+        compress = ENCODINGS[encoding]
+        if len(body) >= self.offload_size:
+            loop = asyncio.get_event_loop()
+            body = await loop.run_in_executor(None, compress, body, self.level)
+        else:
+            body = compress(body, self.level)
+        response.body = body
+        response.headers['Content-Encoding'] = encoding
+        etag = response.headers.get('ETag')
+        if etag:
+            # a strong ETag names one representation
+            response.headers['ETag'] = '{}-{}"'.format(etag[:-1], encoding)
+        vary = response.headers.get('Vary')
+        response.headers['Vary'] = '{}, Accept-Encoding'.format(vary) if vary else 'Accept-Encoding'
+        return response
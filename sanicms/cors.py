@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from sanic.response import raw
+
+PREFLIGHT_BODY = b'{"code":0}'
+
+
+class CorsPolicy:
+    """
+    CORS headers compiled once from the ACCESS_CONTROL_* settings.
+    ACCESS_CONTROL_ALLOW_ORIGIN is either '*', a single origin or a comma
+    separated allow-list; for a list the request Origin is echoed back when
+    it is allowed. ACCESS_CONTROL_MAX_AGE lets browsers cache preflights.
+    """
+
+    def __init__(self, origins='', headers='', methods='', max_age=None):
+        origins = [o.strip() for o in (origins or '').split(',') if o.strip()]
+        self.origins = frozenset(origins) if len(origins) > 1 else None
+        self.headers = {}
+        if len(origins) == 1:
+            self.headers['Access-Control-Allow-Origin'] = origins[0]
+        elif self.origins:
+            self.headers['Vary'] = 'Origin'
+        if headers:
+            self.headers['Access-Control-Allow-Headers'] = headers
+        if methods:
+            self.headers['Access-Control-Allow-Methods'] = methods
+        self.preflight_headers = {}
+        if max_age is not None:
+            self.preflight_headers['Access-Control-Max-Age'] = str(max_age)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(origins=config.get('ACCESS_CONTROL_ALLOW_ORIGIN', ''),
+                   headers=config.get('ACCESS_CONTROL_ALLOW_HEADERS', ''),
+                   methods=config.get('ACCESS_CONTROL_ALLOW_METHODS', ''),
+                   max_age=config.get('ACCESS_CONTROL_MAX_AGE', 600))
+
+    def preflight(self):
+        return raw(PREFLIGHT_BODY, headers=self.preflight_headers.copy(),
+                   content_type='application/json')
+
+    def apply(self, request, response):
+        response.headers.update(self.headers)
+        if self.origins:
+            origin = request.headers.get('Origin')
+            if origin in self.origins:
+                response.headers['Access-Control-Allow-Origin'] = origin
+        return response
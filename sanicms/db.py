@@ -1,19 +1,26 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import time
+import asyncio
 import logging
 import opentracing
 
 from asyncpg import create_pool
 from sanicms.utils import jsonify
+from sanicms.tracing import start_span, is_sampled
+from sanicms.deadline import budget
+from sanicms.metrics import observe_query
 
 
 logger = logging.getLogger('sanic')
 
 class BaseConnection(object):
-    def __init__(self, pool, span=None, conn=None):
+    def __init__(self, pool, span=None, conn=None, deadline=None):
         self._pool = pool
         self._span = span
+        self._deadline = deadline
+        self._kind = None
         self.conn = conn
 
     @property
@@ -21,8 +28,11 @@ class BaseConnection(object):
         return self.conn.rowcount
 
     def before(self, name, query, *args):
-        if self._span:
-            span = opentracing.tracer.start_span(operation_name=name, child_of=self._span)
+        # one query at a time runs on a connection
+        self._kind = name
+        self._start = time.monotonic()
+        if is_sampled(self._span):
+            span = start_span(name, child_of=self._span)
             span.log_kv({ 'event': 'client'})
             span.set_tag('component', 'db-execute')
             span.set_tag('db.type', 'sql')
@@ -31,8 +41,19 @@ class BaseConnection(object):
             return span
 
     def finish(self, span):
+        observe_query(self._kind, self._start)
+        self._kind = None
         if span: span.finish()
 
+    def failed(self):
+        # the query that raised never reached finish
+        if self._kind:
+            observe_query(self._kind, self._start, failed=True)
+            self._kind = None
+
+    def timeout(self, timeout=None):
+        return budget(self._deadline, timeout)
+
     async def add_listener(self, channel, callback):
         await self.conn.add_listener(channel, callback)
 
@@ -41,37 +62,48 @@ class BaseConnection(object):
 
     async def execute(self, query:str, *args, timeout:float=None):
         span = self.before('execute', query, *args)
-        res = await self.conn.execute(query, *args, timeout=timeout)
+        res = await self.conn.execute(query, *args, timeout=self.timeout(timeout))
         self.finish(span)
         return res
 
     async def executemany(self, command:str, args, timeout:float=None):
         span = self.before('executemany', command, args)
-        res = await self.conn.executemmay(command, args, timeout=timeout)
+        res = await self.conn.executemany(command, args, timeout=self.timeout(timeout))
         self.finish(span)
         return res
 
     async def fetch(self, query, *args, timeout=None):
         span = self.before('fetch', query, *args)
-        res = jsonify(await self.conn.fetch(query, *args, timeout=timeout))
+        res = jsonify(await self.conn.fetch(query, *args, timeout=self.timeout(timeout)))
         self.finish(span)
         return res
 
+    async def cursor(self, query, *args, prefetch=None):
+        """
+        Iterate over the rows of `query` as dicts, must run in a transaction
+        """
+        span = self.before('cursor', query, *args)
+        try:
+            async for record in self.conn.cursor(query, *args, prefetch=prefetch):
+                yield dict(record.items())
+        finally:
+            self.finish(span)
+
     async def fetchrow(self, query, *args, timeout=None):
         span = self.before('fetchrow', query, *args)
-        res = dict(await self.conn.fetchrow(query, *args, timeout=timeout))
+        res = dict(await self.conn.fetchrow(query, *args, timeout=self.timeout(timeout)))
         self.finish(span)
         return res
 
     async def fetchval(self, query, *args, column=0, timeout=None):
         span = self.before('fetchval', query, *args)
-        res = await self.conn.fetchval(query, *args, column=column, timeout=timeout)
+        res = await self.conn.fetchval(query, *args, column=column, timeout=self.timeout(timeout))
         self.finish(span)
         return res
 
     async def prepare(self, query, *args, timeout=None):
         span = self.before('prepare', query, *args)
-        res = await self.conn.prepare(query, *args, timeout=None)
+        res = await self.conn.prepare(query, *args, timeout=self.timeout(timeout))
         self.finish(span)
         return res
 
@@ -95,19 +127,21 @@ class BaseConnection(object):
         await self.conn.close()
 
     async def __aenter__(self):
-        self.conn = await self._pool.acquire() if not self.conn else self.conn
+        self.conn = await self._pool.acquire(timeout=self.timeout()) if not self.conn else self.conn
         return self
 
     async def __aexit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.failed()
         await self.release()
 
 class TransactionConnection(BaseConnection):
-    def __init__(self, pool, span=None, conn=None):
-        super(TransactionConnection, self).__init__(pool, span)
+    def __init__(self, pool, span=None, conn=None, deadline=None):
+        super(TransactionConnection, self).__init__(pool, span, deadline=deadline)
         self.conn = conn
 
     async def __aenter__(self):
-        self.conn = await self._pool.acquire() if not self.conn else self.conn
+        self.conn = await self._pool.acquire(timeout=self.timeout()) if not self.conn else self.conn
         self.tr = self.transaction()
         await self.tr.start()
         return self
@@ -117,6 +151,7 @@ class TransactionConnection(BaseConnection):
             if exc_type is None:
                 await self.tr.commit()
             else:
+                self.failed()
                 await self.tr.rollback()
         except:
             pass
@@ -142,12 +177,36 @@ class ConnectionPool(object):
         self._pool = await create_pool(**config, loop=self._loop, max_size=100)
         return self
 
+    async def close(self, timeout=None):
+        """
+        Wait for the connections in use to be released, terminate the pool
+        if that takes longer than `timeout` seconds
+        """
+        if self._pool is None:
+            return
+        try:
+            await asyncio.wait_for(self._pool.close(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning('close db pool timeout, terminate it')
+            self._pool.terminate()
+
     def acquire(self, request=None):
-        return BaseConnection(self._pool, span=request['span'] if request else None)
+        return BaseConnection(self._pool, span=request['span'] if request else None,
+                              deadline=request.get('deadline') if request else None)
+
+    async def iterate(self, query, *args, request=None, prefetch=None):
+        """
+        Async iterator over the rows of `query` holding its own connection
+        and transaction, handlers can return it to stream the response
+        """
+        async with self.transaction(request) as cur:
+            async for row in cur.cursor(query, *args, prefetch=prefetch):
+                yield row
 
     def transaction(self, request=None):
         return TransactionConnection(
             self._pool,
             span=request['span'] if request else None,
-            conn=self.conn
+            conn=self.conn,
+            deadline=request.get('deadline') if request else None
         )
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import inspect
+import logging
+import functools
+
+from sanic.router import Router
+
+from sanicms.compat import current_task
+from sanicms.exception import GatewayTimeout
+from sanicms.routes import get_route
+
+logger = logging.getLogger('sanic')
+
+# remaining budget of the caller in milliseconds
+DEADLINE_HEADER = 'X-Request-Timeout'
+
+# handler -> default budget in seconds set with @deadline(...)
+route_deadlines = {}
+
+# handlers never cancelled by a deadline
+exempt_handlers = set()
+
+# handler -> handler turning the deadline's CancelledError into GatewayTimeout
+guarded = {}
+
+
+def deadline(seconds):
+    """
+    Budget of the route when the caller sent none, a caller's budget is
+    capped by it
+    """
+    def inner(func):
+        route_deadlines[func] = seconds
+        return func
+    return inner
+
+
+def exempt(func):
+    """
+    No deadline for the route, neither the default nor the caller's
+    """
+    exempt_handlers.add(func)
+    return func
+
+
+def remaining(deadline):
+    """
+    Seconds left until `deadline` (loop time), GatewayTimeout once it passed
+    """
+    if deadline is None:
+        return None
+    left = deadline - asyncio.get_event_loop().time()
+    if left <= 0:
+        raise GatewayTimeout(message='Deadline exceeded')
+    return left
+
+
+def budget(deadline, timeout=None):
+    """
+    `timeout` capped by the time left until `deadline`
+    """
+    left = remaining(deadline)
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+def forward(deadline, headers):
+    """
+    Pass the time left to a downstream service
+    """
+    left = remaining(deadline)
+    if left is not None:
+        headers[DEADLINE_HEADER] = str(int(left * 1000))
+    return headers
+
+
+def start_deadline(request):
+    """
+    Set request['deadline'] from the caller's header or the route default
+    and cancel the request once it passed
+    """
+    handler = get_route(request).handler
+    if handler in exempt_handlers:
+        return
+    seconds = route_deadlines.get(handler, request.app.config.get('DEADLINE_DEFAULT'))
+    value = request.headers.get(DEADLINE_HEADER)
+    if value:
+        try:
+            caller = int(value) / 1000.0
+        except ValueError:
+            caller = None
+        if caller is not None:
+            if caller <= 0:
+                raise GatewayTimeout(message='Deadline exceeded')
+            seconds = caller if seconds is None else min(seconds, caller)
+    if seconds is None:
+        return
+    loop = asyncio.get_event_loop()
+    request['deadline'] = loop.time() + seconds
+    task = current_task(loop=loop)
+    if task is not None:
+        request['deadline_timer'] = loop.call_later(seconds, task.cancel)
+
+
+def stop_deadline(request):
+    timer = request.get('deadline_timer')
+    if timer is not None:
+        timer.cancel()
+        request['deadline_timer'] = None
+
+
+def deadline_exceeded(request):
+    deadline = request.get('deadline')
+    return deadline is not None and deadline <= asyncio.get_event_loop().time()
+
+
+def check_cancelled(request):
+    """
+    Call when catching CancelledError: GatewayTimeout if the request's
+    deadline cancelled it. From python 3.8 CancelledError is no Exception,
+    sanic doesn't pass it to the error handler and sends no response.
+    """
+    if deadline_exceeded(request):
+        raise GatewayTimeout(message='Deadline exceeded')
+
+
+def guard(handler):
+    wrapper = guarded.get(handler)
+    if wrapper is not None:
+        return wrapper
+
+    @functools.wraps(handler)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+            return response
+        except asyncio.CancelledError:
+            check_cancelled(request)
+            raise
+    guarded[handler] = wrapper
+    return wrapper
+
+
+class DeadlineRouter(Router):
+    """
+    Router returning the handlers wrapped by `guard`, the handler routed
+    to stays in `__wrapped__`. The result is kept in request['routed'],
+    get_route routes in the request middleware and sanic reuses it.
+    """
+
+    def get(self, request):
+        routed = request.get('routed')
+        if routed is None:
+            handler, args, kwargs, uri = super().get(request)
+            routed = request['routed'] = (guard(handler), args, kwargs, uri)
+        return routed
@@ -1,11 +1,22 @@
+import sys
 from collections import defaultdict
 from datetime import date, datetime
-from peewee import ModelBase
-from playhouse.postgres_ext import ArrayField
 import logging
 
 logger = logging.getLogger('sanic')
 
+
+# peewee and playhouse are only imported by the models, a schema can't be
+# one of their types unless they are loaded already
+def is_model(schema_type):
+    peewee = sys.modules.get('peewee')
+    return peewee is not None and issubclass(schema_type, peewee.ModelBase)
+
+
+def is_array_field(field):
+    postgres_ext = sys.modules.get('playhouse.postgres_ext')
+    return postgres_ext is not None and isinstance(field, postgres_ext.ArrayField)
+
 class Field:
     def __init__(self, description=None, required=None, name=None):
         self.name = name
@@ -158,7 +169,7 @@ class PeeweeObject(Field):
     def db_field_serialize(self, ttype, desc=None, format=None, related=None):
         if related:
             schema_type = type(related)
-            if issubclass(schema_type, ModelBase):
+            if is_model(schema_type):
                 return PeeweeObject(related).serialize()
             if schema_type is type:
                 if ttype == 'array': return List(related).serialize()
@@ -173,7 +184,7 @@ class PeeweeObject(Field):
     def field_serialize(self, schema):
         field = schema.field
         db_field = field.field_type
-        if isinstance(field, ArrayField):
+        if is_array_field(field):
             return self.db_field_serialize('array', field.verbose_name, None,
                                            field.help_text)
         elif db_field == 'DEFAULT':
@@ -263,7 +274,7 @@ def serialize_schema(schema):
     # Object
     # --------------------------------------------------------------- #
     else:
-        if issubclass(schema_type, ModelBase):
+        if is_model(schema_type):
             return PeeweeObject(schema).serialize()
         elif issubclass(schema_type, Field):
             return schema.serialize()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import uuid
+import asyncio
+import inspect
+import decimal
+import datetime
+import logging
+
+from sanicms.compat import current_task
+
+logger = logging.getLogger('sanic')
+
+ENVELOPE_PREFIX = b'{"code":0,"data":'
+PAGINATION = b',"pagination":'
+ENVELOPE_SUFFIX = b'}'
+STREAM_PREFIX = b'{"code":0,"data":['
+STREAM_SUFFIX = b']}'
+
+
+def json_default(obj):
+    """
+    Values asyncpg returns that the JSON backends can't encode natively
+    """
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        # numeric columns (money) would lose precision as float
+        return str(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    raise TypeError('{!r} is not JSON serializable'.format(obj))
+
+
+def stdlib_dumps(obj):
+    return json.dumps(obj, default=json_default, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def orjson_backend():
+    import orjson
+    option = getattr(orjson, 'OPT_NON_STR_KEYS', 0)
+
+    def dumps(obj):
+        try:
+            return orjson.dumps(obj, default=json_default, option=option)
+        except TypeError:
+            # ints over 64 bits, non str keys on old orjson versions
+            return stdlib_dumps(obj)
+    return dumps
+
+
+def ujson_backend():
+    import ujson
+    if ujson.dumps(decimal.Decimal('0.1'), default=json_default) != '"0.1"':
+        # newer ujson writes Decimal as a float itself, never calling `default`
+        raise ImportError('ujson {} loses Decimal precision'.format(
+            getattr(ujson, '__version__', '')))
+    try:
+        ujson.dumps(datetime.date.today(), default=json_default)
+    except TypeError:
+        # ujson before 5.0 has no `default`, fall back per call
+        def dumps(obj):
+            try:
+                return ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+            except (TypeError, OverflowError):
+                return stdlib_dumps(obj)
+        return dumps
+
+    def dumps(obj):
+        return ujson.dumps(obj, ensure_ascii=False, default=json_default).encode('utf-8')
+    return dumps
+
+
+BACKENDS = {
+    'orjson': orjson_backend,
+    'ujson': ujson_backend,
+    'json': lambda: stdlib_dumps,
+}
+
+
+def get_dumps(backend='auto'):
+    """
+    Return a `dumps(obj) -> bytes` for the JSON backend, 'auto' picks the
+    fastest one installed, the stdlib json is used when it can't be loaded
+    """
+    if backend != 'auto':
+        try:
+            return BACKENDS[backend]()
+        except ImportError as e:
+            logger.warning('JSON backend {} unavailable, using json: {}'.format(backend, e))
+            return stdlib_dumps
+    for name in ('orjson', 'ujson'):
+        try:
+            return BACKENDS[name]()
+        except ImportError:
+            continue
+    return stdlib_dumps
+
+
+class EnvelopeEncoder:
+    """
+    Encode handler results into the {"code": 0, "data": ...} envelope by
+    writing the fixed bytes around the serialized payload
+    """
+
+    def __init__(self, backend='auto'):
+        self.dumps = get_dumps(backend)
+
+    def encode(self, data, pagination=None):
+        if pagination is None:
+            return b''.join((ENVELOPE_PREFIX, self.dumps(data), ENVELOPE_SUFFIX))
+        return b''.join((ENVELOPE_PREFIX, self.dumps(data), PAGINATION,
+                         self.dumps(pagination), ENVELOPE_SUFFIX))
+
+    def stream(self, rows, flush_rows=100, done=None):
+        """
+        Return a sanic streaming function writing the envelope for the
+        async iterator `rows`, one chunk every `flush_rows` rows.
+        `rows` is closed and `done` called once the stream has ended, or
+        with the request task if sanic never started streaming.
+        """
+        dumps = self.dumps
+        closed = []
+
+        async def close():
+            if closed:
+                return
+            closed.append(True)
+            try:
+                # give ConnectionPool.iterate its connection back now
+                if hasattr(rows, 'aclose'):
+                    await rows.aclose()
+            finally:
+                if done:
+                    done()
+
+        async def streaming_fn(response):
+            try:
+                chunk = [STREAM_PREFIX]
+                count = 0
+                async for row in rows:
+                    if count:
+                        chunk.append(b',')
+                    chunk.append(dumps(row))
+                    count += 1
+                    if count % flush_rows == 0:
+                        await write(response, b''.join(chunk))
+                        chunk = []
+                chunk.append(STREAM_SUFFIX)
+                await write(response, b''.join(chunk))
+            except Exception as e:
+                logger.error('stream response failed: {}'.format(e))
+                raise
+            finally:
+                await close()
+
+        def task_done(task):
+            if not closed:
+                asyncio.ensure_future(close())
+
+        task = current_task()
+        if task is not None:
+            task.add_done_callback(task_done)
+        return streaming_fn
+
+
+async def write(response, data):
+    # StreamingHTTPResponse.write became a coroutine in later sanic versions
+    res = response.write(data)
+    if inspect.isawaitable(res):
+        await res
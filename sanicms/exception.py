@@ -8,8 +8,11 @@ class CustomException(Exception):
     code = 100001
     message = None
     error = None
-    def __init__(self, error=None, code=None, message=None, status_code=None):
+    headers = None
+    def __init__(self, error=None, code=None, message=None, status_code=None, headers=None):
         super().__init__(message)
+        if headers:
+            self.headers = headers
         if message:
             self.message = message
         if code:
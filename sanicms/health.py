@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+
+from sanic.blueprints import Blueprint
+from sanic.response import json
+
+from sanicms import limiter
+
+logger = logging.getLogger('sanic')
+
+blueprint = Blueprint('health')
+
+
+class Health:
+    """
+    Readiness of the worker and the requests it is serving. Requests are
+    refused until `start()`. Once draining the health check fails, and
+    after `stop()` new requests are refused while the in-flight ones finish.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.draining = False
+        self.accepting = False
+        self.inflight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def enter(self, request):
+        if not self.accepting:
+            return False
+        request['inflight'] = True
+        self.inflight += 1
+        self._idle.clear()
+        return True
+
+    def leave(self, request):
+        if not request.get('inflight'):
+            return
+        request['inflight'] = False
+        self.inflight -= 1
+        if self.inflight <= 0:
+            self._idle.set()
+
+    @property
+    def status(self):
+        if self.ready:
+            return 'ready'
+        return 'draining' if self.draining else 'starting'
+
+    def start(self):
+        self.ready = True
+        self.accepting = True
+
+    def drain(self):
+        self.ready = False
+        self.draining = True
+
+    def stop(self):
+        self.drain()
+        self.accepting = False
+
+    async def wait(self, timeout):
+        """
+        Wait up to `timeout` seconds for in-flight requests, True if all finished
+        """
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning('drain timeout, {} requests still in flight'.format(self.inflight))
+            return False
+
+
+@blueprint.route('/health')
+@limiter.exempt
+async def health(request):
+    state = request.app.health
+    return json({'code': 0, 'status': state.status, 'inflight': state.inflight},
+                200 if state.ready else 503)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import math
+import time
+import logging
+
+from sanicms.exception import TooManyRequests
+from sanicms.routes import get_route
+
+logger = logging.getLogger('sanic')
+
+# handler -> AdaptiveLimit options set with @limiter.limit(...)
+route_limits = {}
+
+# handlers never limited, e.g. the health check
+exempt_handlers = set()
+
+
+def limit(**options):
+    """
+    Give the route its own concurrency limit, `options` are the
+    AdaptiveLimit arguments
+    """
+    def decorator(func):
+        route_limits[func] = options
+        return func
+    return decorator
+
+
+def exempt(func):
+    exempt_handlers.add(func)
+    return func
+
+
+class AdaptiveLimit:
+    """
+    AIMD concurrency limit. The limit grows by about one per round trip
+    while the smoothed latency stays within `tolerance` times the
+    baseline, and is multiplied by `backoff` at most once per round trip
+    when latency degrades or requests fail. The baseline is the minimum
+    latency of the current and the previous `window` seconds, so it
+    doesn't follow a degraded latency for at least one window.
+    """
+    __slots__ = ('limit', 'min_limit', 'max_limit', 'tolerance', 'backoff', 'window',
+                 'inflight', 'rtt', 'baseline', 'window_min', 'window_start',
+                 'decreased_at', 'rejected')
+
+    def __init__(self, initial=20, min_limit=1, max_limit=200, tolerance=2.0, backoff=0.9,
+                 window=30.0):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.window = window
+        self.inflight = 0
+        self.rtt = 0.0
+        self.baseline = 0.0
+        self.window_min = 0.0
+        self.window_start = 0.0
+        self.decreased_at = 0.0
+        self.rejected = 0
+
+    def acquire(self):
+        if self.inflight >= int(self.limit):
+            self.rejected += 1
+            return False
+        self.inflight += 1
+        return True
+
+    def observe(self, latency, now):
+        if not self.rtt:
+            self.rtt = self.baseline = self.window_min = latency
+            self.window_start = now
+            return
+        self.rtt += (latency - self.rtt) * 0.1
+        if now - self.window_start >= self.window:
+            # the previous window's minimum until this one has a lower one
+            self.baseline = min(self.window_min, latency)
+            self.window_min = latency
+            self.window_start = now
+        else:
+            self.window_min = min(self.window_min, latency)
+            self.baseline = min(self.baseline, latency)
+
+    def release(self, latency, failed=False, now=None):
+        now = time.monotonic() if now is None else now
+        inflight = self.inflight
+        self.inflight -= 1
+        self.observe(latency, now)
+        if failed or self.rtt > self.baseline * self.tolerance:
+            if now - self.decreased_at >= self.rtt:
+                self.decreased_at = now
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif inflight * 2 >= self.limit:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def retry_after(self):
+        return max(1, int(math.ceil(self.rtt)))
+
+    def stats(self):
+        return {
+            'limit': int(self.limit),
+            'inflight': self.inflight,
+            'rtt': self.rtt,
+            'rejected': self.rejected,
+        }
+
+
+class ConcurrencyLimiter:
+    """
+    One AdaptiveLimit per route, or per blueprint with scope='blueprint'.
+    Requests over the limit are rejected with TooManyRequests.
+    """
+
+    def __init__(self, scope='route', overrides=None, **options):
+        self.scope = scope
+        self.overrides = overrides or {}
+        self.options = options
+        # handler -> AdaptiveLimit, None for exempt handlers
+        self.handlers = {}
+        # route or blueprint name -> AdaptiveLimit
+        self.limits = {}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(scope=config.get('CONCURRENCY_SCOPE', 'route'),
+                   overrides=config.get('CONCURRENCY_LIMITS'),
+                   initial=config.get('CONCURRENCY_INITIAL', 20),
+                   min_limit=config.get('CONCURRENCY_MIN', 1),
+                   max_limit=config.get('CONCURRENCY_MAX', 200),
+                   tolerance=config.get('CONCURRENCY_TOLERANCE', 2.0),
+                   backoff=config.get('CONCURRENCY_BACKOFF', 0.9),
+                   window=config.get('CONCURRENCY_WINDOW', 30.0))
+
+    def resolve(self, route):
+        handler = route.handler
+        if handler in exempt_handlers:
+            return None
+        if self.scope == 'blueprint' and route.blueprint and handler not in route_limits:
+            name = route.blueprint
+            options = self.overrides.get(name, {})
+        else:
+            name = route.uri or route.name
+            options = route_limits.get(handler) or self.overrides.get(route.name, {})
+        adaptive = self.limits.get(name)
+        if adaptive is None:
+            adaptive = self.limits[name] = AdaptiveLimit(**dict(self.options, **options))
+        return adaptive
+
+    def acquire(self, request):
+        route = get_route(request)
+        try:
+            adaptive = self.handlers[route.handler]
+        except KeyError:
+            adaptive = self.handlers[route.handler] = self.resolve(route)
+        if adaptive is None:
+            return
+        if not adaptive.acquire():
+            retry_after = adaptive.retry_after()
+            raise TooManyRequests(message='Too Many Requests, retry in {}s'.format(retry_after),
+                                  headers={'Retry-After': str(retry_after)})
+        request['limit'] = (adaptive, time.monotonic())
+
+    def release(self, request, response=None):
+        acquired = request.get('limit')
+        if acquired is None:
+            return
+        request['limit'] = None
+        adaptive, start = acquired
+        status = getattr(response, 'status', 200)
+        adaptive.release(time.monotonic() - start, failed=status >= 500)
+
+    def stats(self):
+        return {name: adaptive.stats() for name, adaptive in self.limits.items()}
@@ -3,18 +3,23 @@ import sys
 import logging
 import opentracing
 import datetime
-import aiohttp
 import time
 import json
 import traceback as tb
 import functools
 import socket
+import random
+import asyncio
+
+from collections import OrderedDict
+from opentracing.ext import tags
 
 
 from sanic.request import Request
 from basictracer.recorder import SpanRecorder
 
 from sanicms import utils
+from sanicms.tracing import start_span, span_tag, recycle
 
 STANDARD_ANNOTATIONS = {
     'client': {'cs':[], 'cr':[]},
@@ -96,8 +101,7 @@ class JsonFormatter(logging.Formatter):
         return dict(list(defaults.get('@fields', {}).items()) + list(fields.items()))
 
 def gen_span(request, name):
-    span = opentracing.tracer.start_span(operation_name=name,
-                             child_of=request['span'])
+    span = start_span(name, child_of=request['span'])
     span.log_kv({'event': 'server'})
     return span
 
@@ -174,8 +178,119 @@ def logger(type=None, category=None, detail=None, description=None,
     return decorator
 
 class AioReporter(SpanRecorder):
-    def __init__(self, queue=None):
+    """
+    Put finished spans on the (bounded) trace queue without ever blocking.
+    When the queue is full the overflow policy decides which span is lost:
+
+    * drop_newest: discard the span being recorded
+    * drop_oldest: evict the oldest queued span to make room
+    * sample: above `watermark` of the capacity keep spans with a
+      probability that falls linearly to zero as the queue fills up
+    """
+    DROP_NEWEST = 'drop_newest'
+    DROP_OLDEST = 'drop_oldest'
+    SAMPLE = 'sample'
+    POLICIES = (DROP_NEWEST, DROP_OLDEST, SAMPLE)
+
+    def __init__(self, queue=None, policy=DROP_NEWEST, watermark=0.5):
+        if policy not in self.POLICIES:
+            raise ValueError('unknown trace queue policy: {}'.format(policy))
         self.queue = queue
+        self.policy = policy
+        self.watermark = int(queue.maxsize * watermark) if queue else 0
+        self.queued = 0
+        self.dropped = 0
+
+    def record_span(self, span):
+        queue = self.queue
+        if queue.maxsize > 0:
+            size = queue.qsize()
+            if self.policy == self.SAMPLE and size >= self.watermark:
+                keep = (queue.maxsize - size) / (queue.maxsize - self.watermark or 1)
+                if random.random() >= keep:
+                    self.dropped += 1
+                    recycle(span)
+                    return
+            elif self.policy == self.DROP_OLDEST and size >= queue.maxsize:
+                recycle(queue.get_nowait())
+                queue.task_done()
+                self.dropped += 1
+        try:
+            queue.put_nowait(span)
+            self.queued += 1
+        except asyncio.QueueFull:
+            self.dropped += 1
+            recycle(span)
+
+    def stats(self):
+        return {
+            'queued': self.queued,
+            'dropped': self.dropped,
+            'depth': self.queue.qsize(),
+            'capacity': self.queue.maxsize,
+        }
+
+
+class TailSamplingReporter(AioReporter):
+    """
+    Buffer finished spans per trace until the local root server span
+    finishes, then keep the whole trace only if it had an error, took at
+    least `latency` seconds, or falls in the random `rate` baseline.
+    Traces whose root never finishes are discarded after `window` seconds.
+    """
+
+    def __init__(self, queue=None, latency=1.0, rate=0.01, window=30.0, **kwargs):
+        super().__init__(queue=queue, **kwargs)
+        self.latency = latency
+        self.rate = rate
+        self.window = window
+        self.traces = OrderedDict()
+        self.discarded = 0
 
     def record_span(self, span):
-        self.queue.put_nowait(span)
+        now = time.time()
+        trace_id = span.context.trace_id
+        trace = self.traces.get(trace_id)
+        if trace is None:
+            trace = self.traces[trace_id] = (now, [])
+        trace[1].append(span)
+        if span_tag(span, tags.SPAN_KIND) == tags.SPAN_KIND_RPC_SERVER:
+            spans = self.traces.pop(trace_id)[1]
+            if self.keep(span, spans):
+                for s in spans:
+                    super().record_span(s)
+            else:
+                self.discard(spans)
+        self.expire(now)
+
+    def keep(self, root, spans):
+        if root.duration >= self.latency:
+            return True
+        for span in spans:
+            if span_tag(span, 'error.kind') is not None:
+                return True
+        if str(span_tag(root, 'http.status_code', '')).startswith('5'):
+            return True
+        return random.random() < self.rate
+
+    def discard(self, spans):
+        self.discarded += len(spans)
+        for span in spans:
+            recycle(span)
+
+    def expire(self, now):
+        traces = self.traces
+        while traces:
+            first_seen, spans = traces[next(iter(traces))]
+            if now - first_seen < self.window:
+                break
+            traces.popitem(last=False)
+            self.discard(spans)
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({
+            'buffered': len(self.traces),
+            'discarded': self.discarded,
+        })
+        return stats
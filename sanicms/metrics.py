@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import logging
+
+from bisect import bisect_left
+
+from sanic.blueprints import Blueprint
+from sanic.response import text
+
+from sanicms import limiter
+
+logger = logging.getLogger('sanic')
+
+blueprint = Blueprint('metrics')
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=None):
+    pairs = ['{}="{}"'.format(name, escape(value)) for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{{{}}}'.format(','.join(pairs)) if pairs else ''
+
+
+class Counter:
+    """
+    Counter family, one float per label values tuple
+    """
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values = {}
+
+    def inc(self, key, amount=1):
+        try:
+            self.values[key] += amount
+        except KeyError:
+            self.values[key] = amount
+
+    def render(self, lines):
+        lines.append('# HELP {} {}'.format(self.name, self.documentation))
+        lines.append('# TYPE {} counter'.format(self.name))
+        for key, value in self.values.items():
+            lines.append('{}{} {}'.format(self.name, format_labels(self.labels, key), value))
+
+
+class Histogram:
+    """
+    Histogram family. Each label values tuple owns one list holding the
+    per bucket counts, the +Inf count and the sum, so observing a value
+    only increments two slots.
+    """
+
+    def __init__(self, name, documentation, labels=(), buckets=BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.values = {}
+
+    def observe(self, key, value):
+        counts = self.values.get(key)
+        if counts is None:
+            counts = self.values[key] = [0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def render(self, lines):
+        lines.append('# HELP {} {}'.format(self.name, self.documentation))
+        lines.append('# TYPE {} histogram'.format(self.name))
+        for key, counts in self.values.items():
+            total = 0
+            for bound, count in zip(self.buckets, counts):
+                total += count
+                lines.append('{}_bucket{} {}'.format(
+                    self.name, format_labels(self.labels, key, 'le="{}"'.format(bound)), total))
+            total += counts[-2]
+            lines.append('{}_bucket{} {}'.format(
+                self.name, format_labels(self.labels, key, 'le="+Inf"'), total))
+            labels = format_labels(self.labels, key)
+            lines.append('{}_sum{} {}'.format(self.name, labels, counts[-1]))
+            lines.append('{}_count{} {}'.format(self.name, labels, total))
+
+
+requests_total = Counter(
+    'sanicms_requests_total', 'Requests by route, method and status.',
+    ('route', 'method', 'status'))
+request_duration = Histogram(
+    'sanicms_request_duration_seconds', 'Request latency by route.', ('route', 'method'))
+db_query_duration = Histogram(
+    'sanicms_db_query_duration_seconds', 'DB latency by query kind.', ('kind',))
+db_errors_total = Counter(
+    'sanicms_db_errors_total', 'DB queries that raised, by query kind.', ('kind',))
+upstream_duration = Histogram(
+    'sanicms_upstream_duration_seconds', 'Upstream service latency.', ('service',))
+upstream_requests_total = Counter(
+    'sanicms_upstream_requests_total', 'Upstream requests by service and status, '
+    '"error" when no response was received.', ('service', 'status'))
+
+loop_lag = Histogram(
+    'sanicms_loop_lag_seconds', 'Delay of the event loop monitor ticks.', (),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+loop_blocked_total = Counter(
+    'sanicms_loop_blocked_total', 'Times the event loop was blocked past the threshold.')
+
+FAMILIES = [requests_total, request_duration, db_query_duration, db_errors_total,
+            upstream_duration, upstream_requests_total, loop_lag, loop_blocked_total]
+
+
+def observe_request(request, response=None):
+    start = request.get('start_time')
+    if start is None:
+        return
+    request['start_time'] = None
+    route = request.get('route')
+    name = (route.uri or route.name) if route is not None else 'unmatched'
+    status = getattr(response, 'status', 200)
+    requests_total.inc((name, request.method, status))
+    request_duration.observe((name, request.method), time.monotonic() - start)
+
+
+def observe_query(kind, start, failed=False):
+    db_query_duration.observe((kind,), time.monotonic() - start)
+    if failed:
+        db_errors_total.inc((kind,))
+
+
+def observe_upstream(service, start, status=None):
+    upstream_duration.observe((service,), time.monotonic() - start)
+    upstream_requests_total.inc((service, status or 'error'))
+
+
+def gauge(lines, name, documentation, value, kind='gauge'):
+    lines.append('# HELP {} {}'.format(name, documentation))
+    lines.append('# TYPE {} {}'.format(name, kind))
+    lines.append('{} {}'.format(name, value))
+
+
+def render_gauges(app, lines):
+    pool = getattr(getattr(app, 'db', None), '_pool', None)
+    if pool is not None:
+        # Pool.get_size/get_idle_size are only in recent asyncpg versions
+        size = pool.get_size() if hasattr(pool, 'get_size') else \
+            sum(1 for holder in pool._holders if holder._con is not None)
+        idle = pool.get_idle_size() if hasattr(pool, 'get_idle_size') else pool._queue.qsize()
+        gauge(lines, 'sanicms_db_pool_size', 'Open DB connections.', size)
+        gauge(lines, 'sanicms_db_pool_idle', 'Idle DB connections.', idle)
+    queue = getattr(app, 'queue', None)
+    if queue is not None:
+        gauge(lines, 'sanicms_trace_queue_size', 'Spans waiting to be exported.', queue.qsize())
+    reporter = getattr(app, 'reporter', None)
+    if reporter is not None:
+        gauge(lines, 'sanicms_trace_dropped_total', 'Spans dropped by the reporter.',
+              reporter.stats()['dropped'], kind='counter')
+    health = getattr(app, 'health', None)
+    if health is not None:
+        gauge(lines, 'sanicms_requests_inflight', 'Requests being served.', health.inflight)
+
+
+def render(app):
+    lines = []
+    for family in FAMILIES:
+        family.render(lines)
+    render_gauges(app, lines)
+    lines.append('')
+    return '\n'.join(lines)
+
+
+@blueprint.route('/metrics')
+@limiter.exempt
+async def metrics(request):
+    return text(render(request.app), content_type=CONTENT_TYPE)
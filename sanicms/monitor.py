@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+
+from weakref import WeakKeyDictionary
+
+from sanicms.compat import current_task
+from sanicms.metrics import loop_lag, loop_blocked_total
+
+logger = logging.getLogger('sanic')
+
+# task -> request it is serving, to name the route that blocked the loop
+task_requests = WeakKeyDictionary()
+
+
+def track(request):
+    task = current_task()
+    if task is not None:
+        task_requests[task] = request
+
+
+def untrack(request):
+    task = current_task()
+    if task is not None and task_requests.get(task) is request:
+        del task_requests[task]
+
+
+def describe(request):
+    if request is None:
+        return 'no request'
+    route = request.get('route')
+    name = (route.uri or route.name) if route is not None else 'unmatched'
+    return '{} {} (route {})'.format(request.method, request.path, name)
+
+
+class LoopMonitor:
+    """
+    Measure the event loop lag with a task ticking every `threshold / 2`
+    seconds, so that blocks shorter than `interval` are seen too; the
+    largest lag of each `interval` is recorded. A watchdog thread logs
+    the loop thread's stack and the request being served when a tick is
+    late by more than `threshold`.
+    """
+
+    def __init__(self, loop, interval=0.5, threshold=0.1, depth=20):
+        self.loop = loop
+        self.interval = interval
+        self.threshold = threshold
+        self.beat = min(interval, threshold / 2)
+        self.depth = depth
+        self.heartbeat = time.monotonic()
+        self.thread_id = None
+        self.task = None
+        self.stopped = threading.Event()
+        self.watchdog = None
+
+    @classmethod
+    def from_config(cls, loop, config):
+        return cls(loop, interval=config.get('LOOP_MONITOR_INTERVAL', 0.5),
+                   threshold=config.get('LOOP_BLOCK_THRESHOLD', 0.1),
+                   depth=config.get('LOOP_BLOCK_STACK_DEPTH', 20))
+
+    def start(self):
+        self.task = self.loop.create_task(self.tick())
+        self.watchdog = threading.Thread(target=self.watch, name='loop-watchdog', daemon=True)
+        self.watchdog.start()
+        return self
+
+    async def stop(self):
+        self.stopped.set()
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def tick(self):
+        self.thread_id = threading.get_ident()
+        lag = 0
+        sample_at = self.loop.time() + self.interval
+        while True:
+            self.heartbeat = time.monotonic()
+            expected = self.loop.time() + self.beat
+            await asyncio.sleep(self.beat)
+            now = self.loop.time()
+            lag = max(lag, now - expected)
+            if now >= sample_at:
+                loop_lag.observe((), lag)
+                lag = 0
+                sample_at = now + self.interval
+
+    def watch(self):
+        reported = None
+        while not self.stopped.wait(self.threshold / 2):
+            heartbeat = self.heartbeat
+            blocked = time.monotonic() - heartbeat - self.beat
+            if blocked < self.threshold or heartbeat == reported or self.thread_id is None:
+                continue
+            reported = heartbeat
+            loop_blocked_total.inc(())
+            self.report(blocked)
+
+    def report(self, blocked):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        stack = ''.join(traceback.format_stack(frame, limit=self.depth))
+        task = current_task(loop=self.loop)
+        request = task_requests.get(task) if task is not None else None
+        logger.warning('event loop blocked for {:.3f}s serving {}, at {}:{} in {}\n{}'.format(
+            blocked, describe(request), frame.f_code.co_filename, frame.f_lineno,
+            frame.f_code.co_name, stack))
@@ -7,6 +7,7 @@ from sanic.response import json
 from sanic.views import CompositionView
 
 from sanicms.doc import route_specs, RouteSpec, serialize_schema, definitions
+from sanicms.validators import build_validators
 
 logger = logging.getLogger('sanic')
 
@@ -163,6 +164,9 @@ def build_spec(app, loop):
     _spec['paths'] = paths
 
 
+blueprint.listener('before_server_start')(build_validators)
+
+
 @blueprint.route('/spec.json')
 def spec(request):
     return json(_spec)
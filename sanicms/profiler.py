@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import hmac
+import asyncio
+import logging
+import threading
+
+from collections import Counter
+
+from sanic.blueprints import Blueprint
+from sanic.response import text
+
+from sanicms import limiter, deadline
+from sanicms.exception import BadRequest, Forbidden, NotFound, TooManyRequests
+from sanicms.compat import current_task
+from sanicms.monitor import task_requests
+
+logger = logging.getLogger('sanic')
+
+blueprint = Blueprint('debug', url_prefix='debug')
+
+TOKEN_HEADER = 'X-Debug-Token'
+
+
+def route_name(request):
+    route = request.get('route') if request is not None else None
+    return (route.uri or route.name) if route is not None else None
+
+
+class SamplingProfiler:
+    """
+    Sample the loop thread's stack `rate` times per second from a
+    background thread and count the collapsed stacks. The root frame
+    names the asyncio task being run and the route it serves; with
+    `route` set only samples taken while serving that route are kept.
+    """
+
+    def __init__(self, loop, thread_id, rate=100, route=None):
+        self.loop = loop
+        self.thread_id = thread_id
+        self.interval = 1.0 / rate
+        self.route = route
+        self.stacks = Counter()
+        self.samples = 0
+        self.labels = {}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='profiler', daemon=True)
+
+    def label(self, code):
+        try:
+            return self.labels[code]
+        except KeyError:
+            label = self.labels[code] = '{} ({}:{})'.format(
+                code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+            return label
+
+    def task_frame(self):
+        task = current_task(loop=self.loop)
+        if task is None:
+            return 'loop', None
+        request = task_requests.get(task)
+        name = route_name(request)
+        if name is None:
+            coro = getattr(task, '_coro', None)
+            return 'task {}'.format(getattr(coro, '__qualname__', 'unknown')), None
+        return 'task {} {}'.format(request.method, name), name
+
+    def sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        root, name = self.task_frame()
+        if self.route is not None and name != self.route:
+            return
+        stack = []
+        while frame is not None:
+            stack.append(self.label(frame.f_code))
+            frame = frame.f_back
+        stack.append(root)
+        stack.reverse()
+        self.stacks[';'.join(stack)] += 1
+        self.samples += 1
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error('profiler sample failed: {}'.format(e))
+
+    async def profile(self, seconds):
+        self.thread.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self.stopped.set()
+            # a sample in progress would block the loop until it's done
+            await asyncio.get_event_loop().run_in_executor(None, self.thread.join)
+        return self
+
+    def collapsed(self):
+        return ''.join('{} {}\n'.format(stack, count)
+                       for stack, count in sorted(self.stacks.items()))
+
+
+_running = []
+
+
+@blueprint.route('/profile')
+@limiter.exempt
+@deadline.exempt
+async def profile(request):
+    """
+    /debug/profile?seconds=30&rate=100&route=/users/<id:int> returns the
+    collapsed stacks of the worker serving the request
+    """
+    config = request.app.config
+    token = config.get('DEBUG_PROFILE_TOKEN')
+    if not token:
+        raise NotFound(message='Not Found')
+    # str arguments must be ASCII, compare the bytes so others are a 403
+    if not hmac.compare_digest(request.headers.get(TOKEN_HEADER, '').encode('utf-8'),
+                               token.encode('utf-8')):
+        raise Forbidden(message='Forbidden')
+    if _running:
+        raise TooManyRequests(message='Profiler already running')
+    try:
+        seconds = float(request.args.get('seconds', 30))
+        rate = int(request.args.get('rate', 100))
+    except ValueError:
+        raise BadRequest(message='seconds and rate must be numbers')
+    seconds = min(max(seconds, 0), config.get('DEBUG_PROFILE_MAX_SECONDS', 50))
+    rate = min(max(rate, 1), 1000)
+    profiler = SamplingProfiler(asyncio.get_event_loop(), threading.get_ident(),
+                                rate=rate, route=request.args.get('route'))
+    _running.append(profiler)
+    try:
+        await profiler.profile(seconds)
+    finally:
+        _running.remove(profiler)
+    logger.info('profiled {}s, {} samples'.format(seconds, profiler.samples))
+    return text(profiler.collapsed())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import math
+import time
+import logging
+
+from collections import OrderedDict
+
+from sanicms.exception import TooManyRequests
+from sanicms.routes import get_route
+
+logger = logging.getLogger('sanic')
+
+
+class BucketTable:
+    """
+    Token buckets keyed by client, split into `shards` LRU ordered dicts.
+    Each shard keeps at most `max_keys / shards` clients, buckets idle for
+    `idle` seconds are evicted as the table is used.
+    """
+
+    def __init__(self, shards=16, max_keys=100000, idle=300):
+        shards = 1 << max(shards - 1, 0).bit_length()
+        self.mask = shards - 1
+        self.shards = [OrderedDict() for _ in range(shards)]
+        self.shard_size = max(max_keys // shards, 1)
+        self.idle = idle
+        self.evicted = 0
+
+    def take(self, key, rate, burst, now):
+        """
+        Take a token from the bucket of `key`, return 0 or the seconds
+        until one is available
+        """
+        shard = self.shards[hash(key) & self.mask]
+        bucket = shard.pop(key, None)
+        if bucket is None:
+            tokens = burst
+        else:
+            tokens, stamp = bucket
+            tokens = min(burst, tokens + (now - stamp) * rate)
+        wait = 0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        shard[key] = (tokens, now)
+        self.evict(shard, now)
+        return wait
+
+    def evict(self, shard, now):
+        expired = now - self.idle
+        while shard:
+            key = next(iter(shard))
+            if len(shard) <= self.shard_size and shard[key][1] > expired:
+                break
+            del shard[key]
+            self.evicted += 1
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+
+class RateLimit:
+    __slots__ = ('rate', 'burst', 'header', 'table')
+
+    def __init__(self, rate, burst=None, header=None):
+        self.rate = float(rate)
+        self.burst = burst or max(int(math.ceil(rate)), 1)
+        self.header = header
+        self.table = None
+
+
+# handler -> RateLimit set with @rate_limit(...)
+rate_limits = {}
+
+
+def rate_limit(rate, burst=None, header=None):
+    """
+    Allow `rate` requests per second per client with bursts of `burst`.
+    Clients are keyed by `header` (default RATE_LIMIT_HEADER) when the
+    request has it, by IP otherwise.
+    """
+    def inner(func):
+        rate_limits[func] = RateLimit(rate, burst=burst, header=header)
+        return func
+    return inner
+
+
+def build_rate_limits(app, loop=None):
+    for limit in rate_limits.values():
+        limit.header = limit.header or app.config.get('RATE_LIMIT_HEADER')
+        limit.table = BucketTable(shards=app.config.get('RATE_LIMIT_SHARDS', 16),
+                                  max_keys=app.config.get('RATE_LIMIT_MAX_KEYS', 100000),
+                                  idle=app.config.get('RATE_LIMIT_IDLE', 300))
+
+
+def client_key(request, header=None):
+    if header:
+        value = request.headers.get(header)
+        if value:
+            return value
+    ip = request.ip
+    return ip[0] if isinstance(ip, tuple) else ip
+
+
+def check_rate_limit(request):
+    limit = rate_limits.get(get_route(request).handler)
+    if limit is None or limit.table is None:
+        return
+    wait = limit.table.take(client_key(request, limit.header),
+                            limit.rate, limit.burst, time.monotonic())
+    if wait:
+        retry_after = max(1, int(math.ceil(wait)))
+        raise TooManyRequests(message='Rate limit exceeded, retry in {}s'.format(retry_after),
+                              headers={'Retry-After': str(retry_after)})
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+from sanic.request import Request as BaseRequest
+
+from sanicms.exception import BadRequest
+
+try:
+    from ujson import loads
+except ImportError:
+    from json import loads
+
+DATA_METHODS = ('POST', 'PUT', 'PATCH')
+
+
+class Request(BaseRequest):
+    """
+    request['data'] is parsed from the JSON body on first access instead
+    of for every POST, PUT and PATCH. Bodies over REQUEST_DATA_MAX_SIZE and
+    malformed JSON raise BadRequest. Handlers expecting large bodies can
+    `await request.load_data()` to parse bodies over
+    REQUEST_DATA_OFFLOAD_SIZE in the default executor.
+    """
+
+    def __missing__(self, key):
+        if key != 'data' or self.method not in DATA_METHODS:
+            raise KeyError(key)
+        data = self['data'] = self.parse_data()
+        return data
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def parse_data(self):
+        body = self.body
+        if not body:
+            return None
+        limit = self.app.config.get('REQUEST_DATA_MAX_SIZE', 10 * 1024 * 1024)
+        if limit and len(body) > limit:
+            raise BadRequest(message='Request body too large',
+                             error='body exceeds {} bytes'.format(limit))
+        try:
+            return loads(body)
+        except ValueError as e:
+            raise BadRequest(message='Malformed JSON body', error=str(e))
+
+    async def load_data(self):
+        if 'data' in self or self.method not in DATA_METHODS:
+            return self.get('data')
+        if len(self.body or b'') > self.app.config.get('REQUEST_DATA_OFFLOAD_SIZE', 1024 * 1024):
+            loop = asyncio.get_event_loop()
+            self['data'] = await loop.run_in_executor(None, self.parse_data)
+        else:
+            self['data'] = self.parse_data()
+        return self['data']
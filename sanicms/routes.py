@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+
+from itertools import repeat
+
+from sanic.views import CompositionView
+
+from sanicms.compress import exempt_handlers
+
+logger = logging.getLogger('sanic')
+
+# handler -> RouteMeta, built once at startup
+routes = {}
+
+
+class RouteMeta:
+    """
+    Per-route data the middlewares need, computed once at startup
+    """
+    __slots__ = ('handler', 'name', 'uri', 'blueprint', 'tags', 'sample_rate',
+                 'compress')
+
+    def __init__(self, handler, uri=None, blueprint=None, sample_rate=1.0):
+        self.handler = handler
+        self.name = getattr(handler, '__name__', type(handler).__name__)
+        self.uri = uri
+        self.blueprint = blueprint
+        self.tags = {'http.route': uri} if uri else {}
+        self.sample_rate = sample_rate
+        self.compress = handler not in exempt_handlers
+
+
+def build_routes(app, sampler=None):
+    routes.clear()
+    blueprints = {}
+    for blueprint in app.blueprints.values():
+        for route in getattr(blueprint, 'routes', []):
+            blueprints[route.handler] = blueprint.name
+    for uri, route in app.router.routes_all.items():
+        if isinstance(route.handler, CompositionView):
+            method_handlers = route.handler.handlers.items()
+        else:
+            method_handlers = zip(route.methods, repeat(route.handler))
+        for _method, _handler in method_handlers:
+            if _handler in routes:
+                continue
+            routes[_handler] = RouteMeta(
+                _handler, uri=uri, blueprint=blueprints.get(_handler),
+                sample_rate=sampler.rate_for(_handler.__name__) if sampler else 1.0)
+
+
+def get_route(request):
+    """
+    RouteMeta of the request. Request middleware runs before sanic routes
+    the request, so this routes it; sanicms.deadline.DeadlineRouter keeps
+    the result on the request for sanic's own lookup
+    """
+    route = request.get('route')
+    if route is not None:
+        return route
+    handler = request.app.router.get(request)[0]
+    # unwrap the handler of sanicms.deadline.DeadlineRouter
+    handler = getattr(handler, '__wrapped__', handler)
+    if isinstance(handler, CompositionView):
+        handler = handler.handlers.get(request.method, handler)
+    route = routes.get(handler)
+    if route is None:
+        route = routes[handler] = RouteMeta(handler)
+    request['route'] = route
+    return route
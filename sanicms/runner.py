@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import signal
+import socket
+import asyncio
+import inspect
+import logging
+import multiprocessing
+
+from collections import defaultdict
+
+logger = logging.getLogger('sanic')
+
+WORKER_ENV = 'SANICMS_WORKER'
+
+# event -> listeners run once per host by the launcher process:
+# 'before_start' before the workers are forked, 'before_stop' before they
+# are signalled to stop, 'after_stop' after they exited
+host_listeners = defaultdict(list)
+
+
+def host_listener(event):
+    def decorator(func):
+        host_listeners[event].append(func)
+        return func
+    return decorator
+
+
+def worker_id():
+    """
+    Index of this worker when started by `run`, None in a plain app.run()
+    """
+    value = os.environ.get(WORKER_ENV)
+    return int(value) if value else None
+
+
+def run_host_listeners(event, app, loop):
+    for listener in host_listeners[event]:
+        res = listener(app, loop)
+        if inspect.isawaitable(res):
+            loop.run_until_complete(res)
+
+
+def bind_socket(host, port, backlog=100):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+def serve(app, index, host, port, kwargs):
+    # drop the launcher's handlers inherited through fork
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    os.environ[WORKER_ENV] = str(index)
+    sock = bind_socket(host, port, kwargs.get('backlog', 100))
+    app.run(sock=sock, workers=1, **kwargs)
+
+
+def run(app, host='0.0.0.0', port=8000, workers=None, **kwargs):
+    """
+    Run `app` in `workers` processes (default: one per CPU), each with its
+    own SO_REUSEPORT socket so the kernel balances connections between
+    them. Host listeners (e.g. the consul registration) run once here,
+    app listeners run in every worker. Workers that die are restarted.
+    """
+    port = int(port)
+    # the host listeners register this port with consul
+    app.config['PORT'] = port
+    workers = int(workers or multiprocessing.cpu_count())
+    context = multiprocessing.get_context('fork')
+    loop = asyncio.new_event_loop()
+    run_host_listeners('before_start', app, loop)
+
+    processes = {}
+
+    def start(index):
+        process = context.Process(target=serve, args=(app, index, host, port, kwargs),
+                                  name='{}-worker-{}'.format(app.name, index))
+        process.daemon = True
+        process.start()
+        processes[index] = process
+        logger.info('start worker {} pid: {}'.format(index, process.pid))
+
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    try:
+        for index in range(1, workers + 1):
+            start(index)
+        while not stopping:
+            for index, process in list(processes.items()):
+                if not process.is_alive() and not stopping:
+                    logger.error('worker {} exited with {}, restarting'.format(
+                        index, process.exitcode))
+                    start(index)
+            time.sleep(1)
+        run_host_listeners('before_stop', app, loop)
+        for process in processes.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+        for process in processes.values():
+            process.join()
+    finally:
+        run_host_listeners('after_stop', app, loop)
+        loop.close()
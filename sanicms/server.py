@@ -1,49 +1,146 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import asyncio
-import logging
-import logging.config
-import datetime
-import yaml
-import os
-import opentracing
-
-from collections import defaultdict
-from basictracer import BasicTracer
-
-from sanic import Sanic, config
-from sanic.response import json, text, HTTPResponse
-from sanic.exceptions import RequestTimeout, NotFound
-
-from sanicms import load_config
-from sanicms.db import ConnectionPool
-from sanicms.utils import *
-from sanicms.loggers import AioReporter
-from sanicms.openapi import blueprint as openapi_blueprint
-from sanicms.service import ServiceManager, service_watcher
-
-with open(os.path.join(os.path.dirname(__file__), 'logging.yml'), 'r') as f:
-    logging.config.dictConfig(yaml.load(f))
-
-config = load_config()
-appid = config.get('APP_ID', __name__)
-app = Sanic(appid, error_handler=CustomHandler())
-app.config = config
-app.blueprint(openapi_blueprint)
+import time
+from sanicms.startup import ImportTimer, timed, time_listeners, step, report
+
+import_timer = ImportTimer().start()
+
+# restore builtins.__import__ even if an import fails
+try:
+    import asyncio
+    import inspect
+    import logging
+    import logging.config
+    import datetime
+    import os
+    import opentracing
+
+    from collections import defaultdict
+
+    from sanic import Sanic, config
+    from sanic.response import json, text, raw, stream, HTTPResponse
+    from sanic.exceptions import RequestTimeout, NotFound
+    from sanicms.exception import ServiceUnavailable
+
+    from sanicms import load_config
+    from sanicms.db import ConnectionPool
+    from sanicms.utils import *
+    from sanicms.loggers import AioReporter, TailSamplingReporter
+    from sanicms.tracing import Sampler, Tracer
+    from sanicms.spool import SpanSpool
+    from sanicms.cors import CorsPolicy
+    from sanicms.encoder import EnvelopeEncoder
+    from sanicms.compress import Compressor
+    from sanicms.limiter import ConcurrencyLimiter
+    from sanicms.ratelimit import build_rate_limits, check_rate_limit
+    from sanicms.singleflight import join_flight, land_flight
+    from sanicms.cache import ResponseCache, not_modified
+    from sanicms.deadline import start_deadline, stop_deadline, check_cancelled, DeadlineRouter
+    from sanicms.metrics import observe_request, blueprint as metrics_blueprint
+    from sanicms.monitor import LoopMonitor, track, untrack
+    from sanicms.profiler import blueprint as debug_blueprint
+    from sanicms.request import Request
+    from sanicms.validators import validate_request
+    from sanicms.routes import build_routes
+    from sanicms.openapi import blueprint as openapi_blueprint
+    from sanicms.health import Health, health, blueprint as health_blueprint
+    from sanicms.service import ServiceManager, service_watcher
+    from sanicms.runner import host_listener, worker_id
+finally:
+    import_timer.stop()
+
+
+def configure_logging():
+    import yaml
+    # the libyaml loader is several times faster when available
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    with open(os.path.join(os.path.dirname(__file__), 'logging.yml'), 'r') as f:
+        logging.config.dictConfig(yaml.load(f, Loader=loader))
+
+
+class App(Sanic):
+    """
+    Times the listeners once the server starts, including the ones the
+    service registers after importing sanicms.server
+    """
+
+    def run(self, *args, **kwargs):
+        time_listeners(self)
+        return super().run(*args, **kwargs)
+
+    async def create_server(self, *args, **kwargs):
+        time_listeners(self)
+        return await super().create_server(*args, **kwargs)
+
+
+with timed('logging config'):
+    configure_logging()
+
+with timed('load config'):
+    config = load_config()
+with timed('create app'):
+    appid = config.get('APP_ID', __name__)
+    app = App(appid, router=DeadlineRouter(), error_handler=CustomHandler(),
+              request_class=Request)
+    app.config = config
+    app.blueprint(openapi_blueprint)
+    app.blueprint(health_blueprint)
+    app.blueprint(metrics_blueprint)
+    app.blueprint(debug_blueprint)
+# aiohttp sessions of sanicms.client.Client, closed when draining
+app.clients = []
 
 
 @app.listener('before_server_start')
 async def before_server_start(app, loop):
-    queue = asyncio.Queue()
+    app.health = Health()
+    app.monitor = LoopMonitor.from_config(loop, app.config).start() \
+        if app.config.get('LOOP_MONITOR_ENABLED', True) else None
+    queue = asyncio.Queue(maxsize=app.config.get('TRACE_QUEUE_SIZE', 10000))
     app.queue = queue
-    loop.create_task(consume(queue, app))
+    spool_path = app.config.get('ZIPKIN_SPOOL_PATH')
+    if spool_path and worker_id() is not None:
+        spool_path = os.path.join(spool_path, 'worker-{}'.format(worker_id()))
+    app.spool = SpanSpool(
+        spool_path,
+        segment_size=app.config.get('ZIPKIN_SPOOL_SEGMENT_SIZE', 16 * 1024 * 1024),
+        max_segments=app.config.get('ZIPKIN_SPOOL_MAX_SEGMENTS', 8)) if spool_path else None
+    app.consumer = loop.create_task(consume(queue, app))
     loop.create_task(service_watcher(app, loop))
-    reporter = AioReporter(queue=queue)
-    tracer = BasicTracer(recorder=reporter)
+    policy = app.config.get('TRACE_QUEUE_POLICY', AioReporter.DROP_NEWEST)
+    if app.config.get('TRACE_REPORTER') == 'tail':
+        reporter = TailSamplingReporter(
+            queue=queue, policy=policy,
+            latency=app.config.get('TRACE_TAIL_LATENCY', 1.0),
+            rate=app.config.get('TRACE_TAIL_RATE', 0.01),
+            window=app.config.get('TRACE_TAIL_WINDOW', 30.0))
+    else:
+        reporter = AioReporter(queue=queue, policy=policy)
+    app.reporter = reporter
+    tracer = Tracer(recorder=reporter,
+                    pool_size=app.config.get('TRACE_SPAN_POOL_SIZE', 1024))
     tracer.register_required_propagators()
     opentracing.tracer = tracer
-    app.db = await ConnectionPool(loop=loop).init(app.config['DB_CONFIG'])
+    app.sampler = Sampler(rate=app.config.get('TRACE_SAMPLE_RATE', 1.0),
+                          routes=app.config.get('TRACE_SAMPLE_ROUTES'))
+    build_routes(app, app.sampler)
+    build_rate_limits(app, loop)
+    app.cors = CorsPolicy.from_config(app.config)
+    app.encoder = EnvelopeEncoder(app.config.get('JSON_BACKEND', 'auto'))
+    app.compressor = Compressor.from_config(app.config) \
+        if app.config.get('COMPRESS_ENABLED', False) else None
+    app.response_cache = ResponseCache.from_config(app.config)
+    app.limiter = ConcurrencyLimiter.from_config(app.config) \
+        if app.config.get('CONCURRENCY_LIMIT_ENABLED', False) else None
+    # the pool and the consul registration are slow network round trips,
+    # run them concurrently while the server starts and await them in
+    # after_server_start; requests get 503 until then
+    steps = [step('db pool', init_db(app, loop))]
+    # started by sanicms.runner.run the launcher registers the process group
+    if worker_id() is None:
+        steps.append(step('consul register', register_service(app, loop)))
+    app.startup = asyncio.gather(*steps)
     # service = ServiceManager(loop=loop, host=app.config['CONSUL_AGENT_HOST'])
     # services = await service.discovery_services()
     # app.services = defaultdict(list)
@@ -52,59 +149,143 @@ async def before_server_start(app, loop):
     #     app.services[name].extend(s)
 
 
+async def init_db(app, loop):
+    app.db = await ConnectionPool(loop=loop).init(app.config['DB_CONFIG'])
+
+
+@host_listener('before_start')
+async def register_service(app, loop):
+    service = ServiceManager(app.name, loop=loop, host=app.config['CONSUL_AGENT_HOST'],
+                             port=app.config.get('CONSUL_AGENT_PORT', 8500))
+    await service.register_service(host=app.config.get('HOST'), port=app.config['PORT'],
+                                   check_path=app.config.get('HEALTH_CHECK_PATH', '/health'))
+    app.service = service
+
+
+@host_listener('before_stop')
+async def deregister_service(app, loop):
+    await app.service.deregister()
+
+
 @app.listener('after_server_start')
 async def after_server_start(app, loop):
-    service = ServiceManager(app.name, loop=loop, host=app.config['CONSUL_AGENT_HOST'])
-    await service.register_service(app.config['PORT'])
-    app.service = service
+    await app.startup
+    app.health.start()
+    report()
 
 
 @app.listener('before_server_stop')
 async def before_server_stop(app, loop):
-    await app.service.deregister()
-    app.queue.join()
+    """
+    Drain the worker: deregister, fail the health check while still serving
+    for DRAIN_DELAY seconds, then refuse new requests and wait up to
+    DRAIN_TIMEOUT seconds for the in-flight ones before flushing the
+    trace queue and closing the pools
+    """
+    state = app.health
+    state.drain()
+    if worker_id() is None:
+        try:
+            await deregister_service(app, loop)
+        except Exception as e:
+            logger.error('deregister service failed: {}'.format(e))
+    delay = app.config.get('DRAIN_DELAY', 0)
+    if delay:
+        await asyncio.sleep(delay)
+    state.stop()
+    timeout = app.config.get('DRAIN_TIMEOUT', 15)
+    await state.wait(timeout)
+    app.consumer.cancel()
+    await app.consumer
+    if app.spool:
+        app.spool.close()
+    for client in app.clients:
+        res = client.close()
+        if inspect.isawaitable(res):
+            await res
+    if getattr(app, 'db', None) is not None:
+        await app.db.close(timeout)
+    if app.monitor:
+        await app.monitor.stop()
+
+
+def release(request, response=None):
+    observe_request(request, response)
+    untrack(request)
+    request.app.health.leave(request)
+    if request.app.limiter:
+        request.app.limiter.release(request, response)
 
 
 @app.middleware('request')
 async def cros(request):
-    config = request.app.config
+    request['start_time'] = time.monotonic()
+    track(request)
+    if not request.app.health.enter(request) and get_route(request).handler is not health:
+        raise ServiceUnavailable(message='Server is {}'.format(
+            'starting' if request.app.health.status == 'starting' else 'shutting down'))
     if request.method == 'OPTIONS':
-        headers = {
-            'Access-Control-Allow-Origin': config['ACCESS_CONTROL_ALLOW_ORIGIN'],
-            'Access-Control-Allow-Headers': config['ACCESS_CONTROL_ALLOW_HEADERS'],
-            'Access-Control-Allow-Methods': config['ACCESS_CONTROL_ALLOW_METHODS']
-        }
-        return json({'code': 0}, headers=headers)
-    if request.method == 'POST' or request.method == 'PUT':
-        request['data'] = request.json
+        return request.app.cors.preflight()
     span = before_request(request)
     request['span'] = span
+    start_deadline(request)
+    check_rate_limit(request)
+    cached = request.app.response_cache.lookup(request)
+    if cached is not None:
+        return cached
+    try:
+        shared = await join_flight(request)
+        if shared is not None:
+            return shared
+        if request.app.limiter:
+            request.app.limiter.acquire(request)
+        await validate_request(request)
+    except asyncio.CancelledError:
+        check_cancelled(request)
+        raise
 
 
 @app.middleware('response')
 async def cors_res(request, response):
-    config = request.app.config
+    stop_deadline(request)
     span = request['span'] if 'span' in request else None
     if response is None:
+        land_flight(request, None)
+        release(request)
         return response
-    result = {'code': 0}
+    if hasattr(response, '__aiter__'):
+        land_flight(request, None)
+        def finish():
+            release(request)
+            if span:
+                span.set_tag('http.status_code', "200")
+                span.set_tag('component', request.app.name)
+                span.finish()
+        response = stream(
+            request.app.encoder.stream(
+                response, request.app.config.get('STREAM_FLUSH_ROWS', 100), finish),
+            content_type='application/json')
+        return request.app.cors.apply(request, response)
     if not isinstance(response, HTTPResponse):
+        encoder = request.app.encoder
         if isinstance(response, tuple) and len(response) == 2:
-            result.update({
-                'data': response[0],
-                'pagination': response[1]
-            })
+            body = encoder.encode(response[0], response[1])
         else:
-            result.update({'data': response})
-        response = json(result)
+            body = encoder.encode(response)
+        response = raw(body, content_type='application/json')
         if span:
             span.set_tag('http.status_code', "200")
+    request.app.response_cache.store(request, response)
+    request.app.response_cache.invalidate(request, response)
+    land_flight(request, response)
+    response = not_modified(request, response)
     if span:
         span.set_tag('component', request.app.name)
         span.finish()
-    response.headers["Access-Control-Allow-Origin"] = config['ACCESS_CONTROL_ALLOW_ORIGIN']
-    response.headers["Access-Control-Allow-Headers"] = config['ACCESS_CONTROL_ALLOW_HEADERS']
-    response.headers["Access-Control-Allow-Methods"] = config['ACCESS_CONTROL_ALLOW_METHODS']
+    response = request.app.cors.apply(request, response)
+    if request.app.compressor:
+        response = await request.app.compressor.compress(request, response)
+    release(request, response)
     return response
 
 
@@ -1,6 +1,4 @@
 import logging
-import consul
-import consul.aio
 import socket
 import hashlib
 import asyncio
@@ -37,6 +35,8 @@ class ServiceManager(object):
     def __init__(self, name=None, loop=None, host='127.0.0.1', port=8500, **kwargs):
         self.name = name
         self.service_id = name
+        # python-consul is only needed once a service registers
+        import consul.aio
         self.consul = consul.aio.Consul(host=host, port=port, loop=loop, **kwargs)
 
     def get_host_ip(self):
@@ -46,7 +46,7 @@ class ServiceManager(object):
         s.close()
         return ip
 
-    async def register_service(self, host=None, port=None):
+    async def register_service(self, host=None, port=None, check_path='/'):
         logger.info('register service ==> port: {}'.format(port))
         if not port:
             return
@@ -57,7 +57,8 @@ class ServiceManager(object):
         m.update(url.encode('utf-8'))
         self.service_id = m.hexdigest()
         service = self.consul.agent.service
-        check = consul.Check.http(url, '10s')
+        import consul
+        check = consul.Check.http(url + check_path.lstrip('/'), '10s')
         res = await service.register(self.name, service_id=self.service_id,
                                address=address, port=port, check=check)
         logger.info('register service: name:{}, service_id:{}, address:{}, port:{}, res:{}'
@@ -78,10 +79,10 @@ class ServiceManager(object):
                     service_name=s['ServiceName'],
                     service_id=s['ServiceID'],
                     service_address=s['ServiceAddress'],
-                    service_port=['ServicePort'],
-                    node=['Node'],
-                    address=['Address'],
-                    service_tags=['ServiceTags']
+                    service_port=s['ServicePort'],
+                    node=s['Node'],
+                    address=s['Address'],
+                    service_tags=s['ServiceTags']
                 ))
         return services
 
@@ -91,29 +92,44 @@ class ServiceManager(object):
         return result
 
     async def check_service(self, service_name):
+        """
+        service id -> 'passing' when all its checks pass, else the first
+        failing status
+        """
         health = self.consul.health
-        checks = health.service(service_name)
+        _, nodes = await health.service(service_name)
         res = {}
-        for check in checks:
-            res[check['ServiceID']] = check
+        for node in nodes:
+            statuses = [check['Status'] for check in node['Checks']
+                        if check['Status'] != 'passing']
+            res[node['Service']['ID']] = statuses[0] if statuses else 'passing'
         return res
 
 
 async def service_watcher(app, loop):
-    service = ServiceManager(loop=loop, host=app.config['CONSUL_AGENT_HOST'])
+    """
+    Keep app.services[name] to the passing instances of each service.
+    Runs in every worker, each process has its own app.services.
+    """
+    service = ServiceManager(loop=loop, host=app.config['CONSUL_AGENT_HOST'],
+                             port=app.config.get('CONSUL_AGENT_PORT', 8500))
     logger.info('service watcher...')
-    app.services = defaultdict(list)
+    app.services = defaultdict(set)
     while True:
-        services = await service.discovery_services()
-        for name in services[1].keys():
-            if 'consul' == name:
-                continue
-            result = await service.discovery_service(name)
-            checks = await service.check_service(name)
-            for res in result:
-                status = checks[res.service_id]['Status']
-                if status == 'passing':
-                    app.services[name].add(res)
-                elif status == 'passing':
-                    app.services[name].discard(res)
-        asyncio.sleep(10)
+        try:
+            services = await service.discovery_services()
+            for name in services[1].keys():
+                if 'consul' == name:
+                    continue
+                result = await service.discovery_service(name)
+                checks = await service.check_service(name)
+                passing = {res for res in result if checks.get(res.service_id) == 'passing'}
+                # updated in place, Client keeps a reference to the set
+                current = app.services[name]
+                current &= passing
+                current |= passing
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error('service watcher failed: {}'.format(e))
+        await asyncio.sleep(10)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+
+from urllib.parse import parse_qsl, urlencode
+
+from sanic.response import HTTPResponse, raw
+
+from sanicms.routes import get_route
+from sanicms.compat import current_task
+from sanicms.deadline import budget
+
+logger = logging.getLogger('sanic')
+
+# handler -> names of the headers the response varies on
+coalesced = {}
+
+# flight key -> future of the leader's (status, headers, content_type, body)
+flights = {}
+
+
+def single_flight(vary=()):
+    """
+    Let concurrent identical GET requests of the route share one
+    execution. Requests are identical when method, path, query and the
+    `vary` headers match, so the response must not depend on anything else.
+    """
+    def inner(func):
+        coalesced[func] = tuple(vary)
+        return func
+    return inner
+
+
+def flight_key(request, vary):
+    query = urlencode(sorted(parse_qsl(request.query_string, keep_blank_values=True)))
+    if not vary:
+        return (request.method, request.path, query)
+    return (request.method, request.path, query) + tuple(
+        request.headers.get(header) for header in vary)
+
+
+async def join_flight(request):
+    """
+    Return the response shared by the request in flight, or None when
+    this request has to execute the handler
+    """
+    if request.method != 'GET':
+        return None
+    vary = coalesced.get(get_route(request).handler)
+    if vary is None:
+        return None
+    key = flight_key(request, vary)
+    future = flights.get(key)
+    if future is None:
+        future = flights[key] = asyncio.get_event_loop().create_future()
+        request['flight'] = key
+        # land even when the leader fails before reaching land_flight
+        task = current_task()
+        if task is not None:
+            task.add_done_callback(lambda _: abandon_flight(key, future))
+        return None
+    timeout = budget(request.get('deadline'),
+                     request.app.config.get('SINGLE_FLIGHT_TIMEOUT', 10))
+    try:
+        shared = await asyncio.wait_for(asyncio.shield(future), timeout)
+    except asyncio.TimeoutError:
+        logger.warning('single flight {} timed out, running the handler'.format(key))
+        return None
+    if shared is None:
+        return None
+    status, headers, content_type, body = shared
+    return raw(body, status=status, headers=dict(headers), content_type=content_type)
+
+
+def abandon_flight(key, future):
+    if flights.get(key) is future:
+        del flights[key]
+    if not future.done():
+        future.set_result(None)
+
+
+def land_flight(request, response):
+    """
+    Share the leader's encoded 2xx response with the requests waiting on
+    it, they execute the handler themselves if it can't be shared
+    """
+    key = request.get('flight')
+    if key is None:
+        return
+    request['flight'] = None
+    future = flights.pop(key, None)
+    if future is None or future.done():
+        return
+    # errors (429 of the limiter, 504 of the leader's deadline, 5xx) are
+    # the leader's own
+    if isinstance(response, HTTPResponse) and 200 <= response.status < 300:
+        future.set_result((response.status, dict(response.headers),
+                           response.content_type, response.body))
+    else:
+        future.set_result(None)
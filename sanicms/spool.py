@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import mmap
+import struct
+import asyncio
+import logging
+
+logger = logging.getLogger('sanic')
+
+SEGMENT_NAME = 'spool-{:08d}.seg'
+SEGMENT_RE = re.compile(r'^spool-(\d{8})\.seg$')
+
+# write offset, read offset, records written, records read
+HEADER = struct.Struct('<IIII')
+RECORD = struct.Struct('<I')
+
+
+class Segment:
+    """
+    Fixed size append-only file mapped into memory. Each record is a
+    length prefix followed by one encoded span batch.
+    """
+
+    def __init__(self, path, size):
+        exists = os.path.exists(path)
+        self.path = path
+        self.file = open(path, 'r+b' if exists else 'w+b')
+        if not exists:
+            self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        if not exists:
+            HEADER.pack_into(self.map, 0, HEADER.size, HEADER.size, 0, 0)
+
+    @property
+    def pending(self):
+        _, _, written, read = HEADER.unpack_from(self.map, 0)
+        return written - read
+
+    def append(self, payload):
+        write, read, written, read_count = HEADER.unpack_from(self.map, 0)
+        end = write + RECORD.size + len(payload)
+        if end > len(self.map):
+            return False
+        RECORD.pack_into(self.map, write, len(payload))
+        self.map[write + RECORD.size:end] = payload
+        HEADER.pack_into(self.map, 0, end, read, written + 1, read_count)
+        return True
+
+    def peek(self):
+        write, read, _, _ = HEADER.unpack_from(self.map, 0)
+        if read >= write:
+            return None
+        size, = RECORD.unpack_from(self.map, read)
+        return self.map[read + RECORD.size:read + RECORD.size + size]
+
+    def advance(self):
+        write, read, written, read_count = HEADER.unpack_from(self.map, 0)
+        if read < write:
+            size, = RECORD.unpack_from(self.map, read)
+            HEADER.pack_into(self.map, 0, write, read + RECORD.size + size,
+                             written, read_count + 1)
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+
+    def remove(self):
+        self.close()
+        os.remove(self.path)
+
+
+class SpanSpool:
+    """
+    Disk spool for span batches that could not be exported. At most
+    `max_segments` segments of `segment_size` bytes are kept, the oldest
+    segment is dropped when the spool is full.
+    """
+
+    def __init__(self, path, segment_size=16 * 1024 * 1024, max_segments=8):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.segment_size = segment_size
+        self.max_segments = max(max_segments, 2)
+        self.spooled = 0
+        self.replayed = 0
+        self.dropped = 0
+        self.seqs = sorted(int(m.group(1)) for m in map(SEGMENT_RE.match, os.listdir(path)) if m)
+        if not self.seqs:
+            self.seqs.append(0)
+        self.writer = self._open(self.seqs[-1])
+        self.reader = self.writer if len(self.seqs) == 1 else self._open(self.seqs[0])
+
+    def _open(self, seq):
+        return Segment(os.path.join(self.path, SEGMENT_NAME.format(seq)), self.segment_size)
+
+    def _next_reader(self):
+        self.reader.remove()
+        self.seqs.pop(0)
+        self.reader = self.writer if len(self.seqs) == 1 else self._open(self.seqs[0])
+
+    def _roll(self):
+        if self.writer is not self.reader:
+            self.writer.close()
+        self.seqs.append(self.seqs[-1] + 1)
+        self.writer = self._open(self.seqs[-1])
+        while len(self.seqs) > self.max_segments:
+            self.dropped += self.reader.pending
+            self._next_reader()
+
+    def append(self, payload):
+        if HEADER.size + RECORD.size + len(payload) > self.segment_size:
+            self.dropped += 1
+            return False
+        if not self.writer.append(payload):
+            self._roll()
+            self.writer.append(payload)
+        self.spooled += 1
+        return True
+
+    def peek(self):
+        while True:
+            payload = self.reader.peek()
+            if payload is not None or self.reader is self.writer:
+                return payload
+            self._next_reader()
+
+    def commit(self):
+        self.reader.advance()
+        self.replayed += 1
+
+    @property
+    def empty(self):
+        return self.peek() is None
+
+    def stats(self):
+        return {
+            'spooled': self.spooled,
+            'replayed': self.replayed,
+            'dropped': self.dropped,
+            'segments': len(self.seqs),
+        }
+
+    def close(self):
+        if self.reader is not self.writer:
+            self.reader.close()
+        self.writer.close()
+
+
+async def replay(spool, send, rate=5, retry=5):
+    """
+    Re-send spooled batches with `send(payload) -> bool`, at most `rate`
+    batches per second, waiting `retry` seconds after a failure
+    """
+    while True:
+        payload = spool.peek()
+        if payload is None:
+            await asyncio.sleep(retry)
+            continue
+        if await send(payload):
+            spool.commit()
+            await asyncio.sleep(1.0 / rate)
+        else:
+            await asyncio.sleep(retry)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import time
+import inspect
+import logging
+import builtins
+import functools
+
+from contextlib import contextmanager
+
+logger = logging.getLogger('sanic')
+
+# imported first by sanicms.server, close enough to the process start
+started = time.monotonic()
+
+# (name, seconds) of the imports, listeners and steps run at startup
+timings = []
+
+
+@contextmanager
+def timed(name):
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        timings.append((name, time.monotonic() - start))
+
+
+def timed_listener(func):
+    """
+    Record the duration of a server listener
+    """
+    if getattr(func, 'timed', False):
+        return func
+    name = 'listener {}'.format(func.__name__)
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with timed(name):
+                return await func(*args, **kwargs)
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(name):
+                return func(*args, **kwargs)
+    wrapper.timed = True
+    return wrapper
+
+
+def time_listeners(app):
+    """
+    Time every listener registered so far, call when the server starts
+    """
+    for event, listeners in app.listeners.items():
+        app.listeners[event] = [timed_listener(listener) for listener in listeners]
+
+
+async def step(name, coro):
+    with timed('step {}'.format(name)):
+        return await coro
+
+
+class ImportTimer:
+    """
+    Time the modules imported directly between start() and stop(), each
+    including the modules it imports in turn
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.original = None
+
+    def start(self):
+        self.original = builtins.__import__
+        builtins.__import__ = self.timed_import
+        return self
+
+    def stop(self):
+        builtins.__import__ = self.original
+
+    def timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules or self.depth:
+            return self.original(name, globals, locals, fromlist, level)
+        self.depth += 1
+        start = time.monotonic()
+        try:
+            return self.original(name, globals, locals, fromlist, level)
+        finally:
+            self.depth -= 1
+            timings.append(('import {}'.format(name), time.monotonic() - start))
+
+
+def report(threshold=0.001):
+    """
+    Log the startup timings taking at least `threshold` seconds, slowest first
+    """
+    lines = ['startup finished in {:.3f}s'.format(time.monotonic() - started)]
+    for name, seconds in sorted(timings, key=lambda timing: -timing[1]):
+        if seconds >= threshold:
+            lines.append('  {:>9.1f}ms  {}'.format(seconds * 1000, name))
+    logger.info('\n'.join(lines))
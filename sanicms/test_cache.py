@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from sanic.response import raw
+
+from sanicms.cache import cache, invalidate, etag_matches, ResponseCache
+from sanicms.testing import make_request
+
+
+@cache(ttl=60)
+async def get_city(request, id):
+    pass
+
+
+@invalidate('/cities')
+async def update_city(request, id):
+    pass
+
+
+async def get_region(request, id):
+    pass
+
+
+class EtagTestCase(unittest.TestCase):
+
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches('"abc"', '"abc"'))
+        self.assertTrue(etag_matches('W/"abc"', '"abc"'))
+        self.assertTrue(etag_matches('"abc-gzip"', '"abc"'))
+        self.assertTrue(etag_matches('"x", "abc"', '"abc"'))
+        self.assertTrue(etag_matches('*', '"abc"'))
+        self.assertFalse(etag_matches('"abcd"', '"abc"'))
+        self.assertFalse(etag_matches('"x"', '"abc"'))
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(blueprints={'region': 30})
+
+    def get(self, path, handler=get_city, body=b'{"code":0}', headers=None):
+        request = make_request('GET', path, handler, blueprint='region', headers=headers)
+        response = self.cache.lookup(request)
+        if response is None:
+            response = raw(body, content_type='application/json')
+            self.cache.store(request, response)
+        return response
+
+    def test_lookup(self):
+        etag = self.get('/cities/1').headers['ETag']
+        response = self.get('/cities/1', body=b'changed')
+        self.assertEqual(response.body, b'{"code":0}')
+        self.assertEqual(self.get('/cities/1', headers={'If-None-Match': etag}).status, 304)
+        self.assertEqual(self.cache.stats()['hits'], 2)
+
+    def test_blueprint_ttl(self):
+        self.get('/regions/1', handler=get_region)
+        self.assertEqual(self.get('/regions/1', handler=get_region, body=b'changed').body,
+                         b'{"code":0}')
+
+    def test_invalidate(self):
+        self.get('/cities/1')
+        self.get('/regions/1', handler=get_region)
+        self.cache.invalidate(make_request('PUT', '/cities/1', update_city, blueprint='region'),
+                              raw(b'', status=200))
+        self.assertEqual(self.get('/cities/1', body=b'changed').body, b'changed')
+        self.assertEqual(self.get('/regions/1', handler=get_region, body=b'changed').body,
+                         b'{"code":0}')
+
+    def test_failed_write_keeps_entries(self):
+        self.get('/cities/1')
+        self.cache.invalidate(make_request('PUT', '/cities/1', update_city, blueprint='region'),
+                              raw(b'', status=500))
+        self.assertEqual(self.cache.stats()['entries'], 1)
+
+    def test_max_entries(self):
+        self.cache.max_entries = 2
+        for index in range(3):
+            self.get('/cities/{}'.format(index))
+        self.assertEqual(self.cache.stats()['entries'], 2)
+        self.assertEqual(self.get('/cities/0', body=b'changed').body, b'changed')
+
+
+if __name__ == '__main__':
+    unittest.main()
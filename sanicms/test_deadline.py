@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import unittest
+
+from sanicms import testing
+from sanicms.deadline import guard, exempt, start_deadline, stop_deadline, DEADLINE_HEADER
+from sanicms.exception import GatewayTimeout
+
+
+async def slow(request):
+    await asyncio.sleep(1)
+
+
+@exempt
+async def profile(request):
+    await asyncio.sleep(1)
+
+
+def make_request(handler, headers=None):
+    return testing.make_request(handler=handler, headers=headers,
+                                config={'DEADLINE_DEFAULT': 0.5})
+
+
+class StartDeadlineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def start(self, request):
+        async def main():
+            start_deadline(request)
+            stop_deadline(request)
+            return request.get('deadline')
+        return self.loop.run_until_complete(main())
+
+    def test_default(self):
+        self.assertIsNotNone(self.start(make_request(slow)))
+
+    def test_caller_budget_exceeded(self):
+        with self.assertRaises(GatewayTimeout):
+            self.start(make_request(slow, {DEADLINE_HEADER: '0'}))
+
+    def test_exempt(self):
+        self.assertIsNone(self.start(make_request(profile, {DEADLINE_HEADER: '10'})))
+
+
+class GuardTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_cancelled(self, request):
+        async def main():
+            task = self.loop.create_task(guard(slow)(request))
+            self.loop.call_later(0.01, task.cancel)
+            return await task
+        return self.loop.run_until_complete(main())
+
+    def test_deadline_exceeded(self):
+        with self.assertRaises(GatewayTimeout):
+            self.run_cancelled({'deadline': self.loop.time()})
+
+    def test_other_cancel(self):
+        with self.assertRaises(asyncio.CancelledError):
+            self.run_cancelled({})
+
+    def test_wrapped(self):
+        self.assertIs(guard(slow), guard(slow))
+        self.assertIs(guard(slow).__wrapped__, slow)
+
+
+if __name__ == '__main__':
+    unittest.main()
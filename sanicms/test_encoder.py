@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import asyncio
+import decimal
+import datetime
+import unittest
+
+from sanicms.encoder import BACKENDS, EnvelopeEncoder, get_dumps, stdlib_dumps
+
+
+class EncodeTestCase(unittest.TestCase):
+
+    def backends(self):
+        for name, backend in BACKENDS.items():
+            try:
+                yield name, backend()
+            except ImportError:
+                continue
+
+    def test_backends_agree(self):
+        data = {1: 'a', 'big': 2 ** 70, 'date': datetime.date(2018, 1, 2),
+                'price': decimal.Decimal('12345678901234567.89'), 'name': '上海'}
+        expected = {'1': 'a', 'big': 2 ** 70, 'date': '2018-01-02',
+                    'price': '12345678901234567.89', 'name': '上海'}
+        for name, dumps in self.backends():
+            with self.subTest(backend=name):
+                self.assertEqual(json.loads(dumps(data).decode('utf-8')), expected)
+
+    def test_unavailable_backend(self):
+        def missing():
+            raise ImportError('missing')
+        BACKENDS['missing'] = missing
+        try:
+            with self.assertLogs('sanic', 'WARNING'):
+                self.assertIs(get_dumps('missing'), stdlib_dumps)
+        finally:
+            del BACKENDS['missing']
+
+    def test_envelope(self):
+        body = EnvelopeEncoder('json').encode([1], {'page': 1})
+        self.assertEqual(json.loads(body.decode('utf-8')),
+                         {'code': 0, 'data': [1], 'pagination': {'page': 1}})
+
+
+class Rows:
+
+    def __init__(self, count):
+        self.rows = iter(range(count))
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return {'id': next(self.rows)}
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def aclose(self):
+        self.closed = True
+
+
+class Response:
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.chunks = []
+
+    async def write(self, data):
+        if self.fail:
+            raise ConnectionResetError('client gone')
+        self.chunks.append(data)
+
+
+class StreamTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.done = []
+
+    def tearDown(self):
+        self.loop.close()
+
+    def stream(self, rows, response=None):
+        async def handle():
+            streaming_fn = EnvelopeEncoder('json').stream(
+                rows, 2, lambda: self.done.append(True))
+            if response is not None:
+                await streaming_fn(response)
+        self.loop.run_until_complete(self.loop.create_task(handle()))
+        # let the request task done callback run
+        self.loop.run_until_complete(asyncio.sleep(0))
+
+    def test_stream(self):
+        rows, response = Rows(3), Response()
+        self.stream(rows, response)
+        self.assertEqual(json.loads(b''.join(response.chunks).decode('utf-8')),
+                         {'code': 0, 'data': [{'id': 0}, {'id': 1}, {'id': 2}]})
+        self.assertTrue(rows.closed)
+        self.assertEqual(self.done, [True])
+
+    def test_write_error(self):
+        rows = Rows(3)
+        with self.assertRaises(ConnectionResetError):
+            self.stream(rows, Response(fail=True))
+        self.assertTrue(rows.closed)
+        self.assertEqual(self.done, [True])
+
+    def test_never_streamed(self):
+        rows = Rows(3)
+        self.stream(rows)
+        self.assertTrue(rows.closed)
+        self.assertEqual(self.done, [True])
+
+
+if __name__ == '__main__':
+    unittest.main()
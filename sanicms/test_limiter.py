@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from sanicms.limiter import AdaptiveLimit
+
+
+def simulate(adaptive, latency, seconds, now, width=200):
+    """
+    Rounds of `width` concurrent requests taking `latency` seconds each,
+    return the limit after each round and the time at the end
+    """
+    limits = []
+    end = now + seconds
+    while now < end:
+        acquired = 0
+        for _ in range(width):
+            if adaptive.acquire():
+                acquired += 1
+        now += latency
+        for _ in range(acquired):
+            adaptive.release(latency, now=now)
+        limits.append(adaptive.limit)
+    return limits, now
+
+
+class AdaptiveLimitTestCase(unittest.TestCase):
+
+    def test_grows_while_latency_is_stable(self):
+        adaptive = AdaptiveLimit(initial=20, max_limit=200)
+        limits, now = simulate(adaptive, 0.01, 5, 0.0)
+        self.assertEqual(limits[-1], 200)
+
+    def test_backs_off_while_latency_is_degraded(self):
+        adaptive = AdaptiveLimit(initial=200, max_limit=200, window=30.0)
+        _, now = simulate(adaptive, 0.01, 5, 0.0)
+        limits, now = simulate(adaptive, 0.2, 10, now)
+        # decreased once per round trip, never climbing back
+        self.assertLess(limits[-1], 20)
+        self.assertEqual(limits, sorted(limits, reverse=True))
+
+    def test_recovers(self):
+        adaptive = AdaptiveLimit(initial=200, max_limit=200, window=30.0)
+        _, now = simulate(adaptive, 0.01, 5, 0.0)
+        _, now = simulate(adaptive, 0.2, 10, now)
+        limits, now = simulate(adaptive, 0.01, 30, now)
+        self.assertEqual(limits[-1], 200)
+
+    def test_failures(self):
+        adaptive = AdaptiveLimit(initial=100)
+        adaptive.acquire()
+        adaptive.release(0.01, now=0.0)
+        adaptive.acquire()
+        adaptive.release(0.01, failed=True, now=1.0)
+        self.assertEqual(adaptive.limit, 90)
+
+    def test_rejects_over_limit(self):
+        adaptive = AdaptiveLimit(initial=2)
+        self.assertTrue(adaptive.acquire())
+        self.assertTrue(adaptive.acquire())
+        self.assertFalse(adaptive.acquire())
+        self.assertEqual(adaptive.stats()['rejected'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
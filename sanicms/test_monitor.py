@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import asyncio
+import unittest
+
+from sanicms.metrics import loop_lag, loop_blocked_total
+from sanicms.monitor import LoopMonitor
+
+
+class LoopMonitorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        loop_lag.values.clear()
+        loop_blocked_total.values.clear()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_block_shorter_than_interval(self):
+        monitor = LoopMonitor(self.loop, interval=0.5, threshold=0.1)
+        monitor.report = lambda blocked: None
+
+        async def main():
+            monitor.start()
+            await asyncio.sleep(0.1)
+            # blocks between two lag samples, well before the next one is due
+            time.sleep(0.3)
+            await asyncio.sleep(0.6)
+            await monitor.stop()
+
+        self.loop.run_until_complete(main())
+        self.assertEqual(loop_blocked_total.values.get(()), 1)
+        counts = loop_lag.values[()]
+        self.assertGreaterEqual(counts[-1], 0.2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import unittest
+
+from sanicms import testing
+from sanicms.exception import Forbidden
+from sanicms.profiler import profile, TOKEN_HEADER
+
+
+class TokenTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_non_ascii_token(self):
+        for sent, token in (('jeton-é', 'secret'), ('secret', 'sécret')):
+            with self.subTest(sent=sent, token=token):
+                request = testing.make_request(
+                    path='/debug/profile', headers={TOKEN_HEADER: sent},
+                    config={'DEBUG_PROFILE_TOKEN': token})
+                with self.assertRaises(Forbidden):
+                    self.loop.run_until_complete(profile(request))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from sanicms.ratelimit import BucketTable
+
+
+class BucketTableTestCase(unittest.TestCase):
+
+    def test_take(self):
+        table = BucketTable(shards=1)
+        self.assertEqual(table.take('a', 1, 2, 0), 0)
+        self.assertEqual(table.take('a', 1, 2, 0), 0)
+        self.assertAlmostEqual(table.take('a', 1, 2, 0), 1)
+        # refilled one token per second
+        self.assertEqual(table.take('a', 1, 2, 1.5), 0)
+        self.assertEqual(table.take('b', 1, 2, 1.5), 0)
+
+    def test_evict_lru(self):
+        table = BucketTable(shards=1, max_keys=2)
+        table.take('a', 1, 1, 0)
+        table.take('b', 1, 1, 1)
+        table.take('a', 1, 1, 2)
+        table.take('c', 1, 1, 3)
+        self.assertEqual(len(table), 2)
+        self.assertEqual(table.evicted, 1)
+        self.assertNotIn('b', table.shards[0])
+
+    def test_evict_idle(self):
+        table = BucketTable(shards=4, max_keys=100, idle=10)
+        for key in range(20):
+            table.take(key, 1, 1, 0)
+        for key in range(4):
+            table.take(key, 1, 1, 11)
+        self.assertEqual(len(table), 4)
+
+    def test_shards(self):
+        self.assertEqual(len(BucketTable(shards=10).shards), 16)
+        self.assertEqual(len(BucketTable(shards=1).shards), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from types import SimpleNamespace
+
+from sanic.router import Router
+
+from sanicms.deadline import DeadlineRouter
+from sanicms.routes import get_route, routes, RouteMeta
+from sanicms.testing import make_request
+
+
+async def get_user(request, id):
+    pass
+
+
+class CountingRouter(Router):
+
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, request):
+        self.calls += 1
+        return get_user, (), {'id': int(request.path.rsplit('/', 1)[1])}, '/users/<id:int>'
+
+
+class GuardedRouter(DeadlineRouter, CountingRouter):
+    pass
+
+
+class GetRouteTestCase(unittest.TestCase):
+
+    def setUp(self):
+        routes[get_user] = RouteMeta(get_user, uri='/users/<id:int>', blueprint='user')
+
+    def tearDown(self):
+        routes.pop(get_user, None)
+
+    def test_routed_once(self):
+        router = GuardedRouter()
+        app = SimpleNamespace(router=router)
+        for id in range(3):
+            request = make_request('GET', '/users/{}'.format(id), app=app)
+            self.assertIs(get_route(request), routes[get_user])
+            handler, args, kwargs, uri = router.get(request)
+            self.assertIs(handler.__wrapped__, get_user)
+            self.assertEqual(kwargs, {'id': id})
+        self.assertEqual(router.calls, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
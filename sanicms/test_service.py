@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import unittest
+
+from types import SimpleNamespace
+
+from sanicms.service import ServiceManager
+
+
+class Health:
+
+    async def service(self, name):
+        return 1, [
+            {'Service': {'ID': 'a'}, 'Checks': [{'Status': 'passing'}, {'Status': 'passing'}]},
+            {'Service': {'ID': 'b'}, 'Checks': [{'Status': 'passing'}, {'Status': 'critical'}]},
+        ]
+
+
+class Catalog:
+
+    async def service(self, name):
+        return 1, [{'ServiceName': name, 'ServiceID': 'a', 'ServiceAddress': '10.0.0.1',
+                    'ServicePort': 8030, 'Node': 'node-1', 'Address': '10.0.0.1',
+                    'ServiceTags': []}]
+
+
+class ServiceManagerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        # python-consul is imported by __init__, the agent is faked here
+        self.service = ServiceManager.__new__(ServiceManager)
+        self.service.consul = SimpleNamespace(health=Health(), catalog=Catalog())
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_check_service(self):
+        checks = self.loop.run_until_complete(self.service.check_service('user'))
+        self.assertEqual(checks, {'a': 'passing', 'b': 'critical'})
+
+    def test_discovery_service(self):
+        services = self.loop.run_until_complete(self.service.discovery_service('user'))
+        self.assertEqual([(s.service_address, s.service_port, s.node) for s in services],
+                         [('10.0.0.1', 8030, 'node-1')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import unittest
+
+from sanic.response import raw
+
+from sanicms import testing
+from sanicms.singleflight import single_flight, join_flight, land_flight, flights
+
+
+@single_flight()
+async def get_user(request, id):
+    pass
+
+
+def make_request():
+    return testing.make_request('GET', '/users/1', get_user,
+                                config={'SINGLE_FLIGHT_TIMEOUT': 0.2})
+
+
+class SingleFlightTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        flights.clear()
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def run_flight(self, leader, followers=1):
+        async def follow():
+            await asyncio.sleep(0)
+            return await join_flight(make_request())
+        async def main():
+            return await asyncio.gather(self.loop.create_task(leader()),
+                                        *[follow() for _ in range(followers)])
+        return self.loop.run_until_complete(main())
+
+    def test_share_success(self):
+        async def leader():
+            request = make_request()
+            self.assertIsNone(await join_flight(request))
+            await asyncio.sleep(0.01)
+            land_flight(request, raw(b'{"code":0}', content_type='application/json'))
+        _, shared = self.run_flight(leader)
+        self.assertEqual(shared.status, 200)
+        self.assertEqual(shared.body, b'{"code":0}')
+        self.assertEqual(flights, {})
+
+    def test_errors_not_shared(self):
+        async def leader():
+            request = make_request()
+            await join_flight(request)
+            await asyncio.sleep(0.01)
+            land_flight(request, raw(b'', status=429, headers={'Retry-After': '1'}))
+        _, shared = self.run_flight(leader)
+        self.assertIsNone(shared)
+
+    def test_leader_failure_lands(self):
+        async def leader():
+            await join_flight(make_request())
+            await asyncio.sleep(0.01)
+            raise TypeError('not serializable')
+        async def main():
+            task = self.loop.create_task(leader())
+            await asyncio.sleep(0)
+            shared = await join_flight(make_request())
+            with self.assertRaises(TypeError):
+                await task
+            return shared
+        self.assertIsNone(self.loop.run_until_complete(main()))
+        self.assertEqual(flights, {})
+
+    def test_follower_timeout(self):
+        async def leader():
+            request = make_request()
+            await join_flight(request)
+            await asyncio.sleep(0.5)
+            land_flight(request, None)
+        _, shared = self.run_flight(leader)
+        self.assertIsNone(shared)
+
+
+if __name__ == '__main__':
+    unittest.main()
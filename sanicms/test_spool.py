@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import tempfile
+import unittest
+
+from sanicms.spool import SpanSpool, HEADER, RECORD, replay
+
+
+def drain(spool):
+    payloads = []
+    while not spool.empty:
+        payloads.append(bytes(spool.peek()))
+        spool.commit()
+    return payloads
+
+
+class SpanSpoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        # room for two 10 byte records per segment
+        self.size = HEADER.size + 2 * (RECORD.size + 10)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def spool(self, max_segments=8):
+        return SpanSpool(self.dir.name, segment_size=self.size, max_segments=max_segments)
+
+    def payloads(self, count):
+        return ['batch-{:04d}'.format(index).encode() for index in range(count)]
+
+    def test_rollover(self):
+        spool = self.spool()
+        payloads = self.payloads(5)
+        for payload in payloads:
+            self.assertTrue(spool.append(payload))
+        self.assertEqual(spool.stats()['segments'], 3)
+        self.assertEqual(drain(spool), payloads)
+        self.assertEqual(spool.stats()['segments'], 1)
+        spool.close()
+
+    def test_drop_oldest(self):
+        spool = self.spool(max_segments=2)
+        payloads = self.payloads(6)
+        for payload in payloads:
+            spool.append(payload)
+        self.assertEqual(spool.stats()['dropped'], 2)
+        self.assertEqual(drain(spool), payloads[2:])
+        spool.close()
+
+    def test_too_large(self):
+        spool = self.spool()
+        self.assertFalse(spool.append(b'x' * self.size))
+        self.assertEqual(spool.stats()['dropped'], 1)
+        spool.close()
+
+    def test_reopen(self):
+        spool = self.spool()
+        payloads = self.payloads(3)
+        for payload in payloads:
+            spool.append(payload)
+        spool.peek()
+        spool.commit()
+        spool.close()
+        spool = self.spool()
+        self.assertEqual(drain(spool), payloads[1:])
+        spool.close()
+
+    def test_replay(self):
+        spool = self.spool()
+        payloads = self.payloads(3)
+        for payload in payloads:
+            spool.append(payload)
+        sent = []
+        attempts = []
+
+        async def send(payload):
+            attempts.append(payload)
+            # the first attempt fails, the batch is retried
+            if len(attempts) == 1:
+                return False
+            sent.append(bytes(payload))
+            return True
+
+        async def main():
+            task = asyncio.ensure_future(replay(spool, send, rate=1000, retry=0.001))
+            while len(sent) < len(payloads):
+                await asyncio.sleep(0.001)
+            task.cancel()
+
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(main())
+        loop.close()
+        self.assertEqual(sent, payloads)
+        self.assertTrue(spool.empty)
+        spool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import unittest
+
+from collections import defaultdict
+from types import SimpleNamespace
+
+from sanicms.startup import time_listeners, timings
+
+
+async def create_clients(app, loop):
+    pass
+
+
+def build_spec(app, loop):
+    pass
+
+
+class TimeListenersTestCase(unittest.TestCase):
+
+    def setUp(self):
+        del timings[:]
+
+    def test_time_listeners(self):
+        app = SimpleNamespace(listeners=defaultdict(list))
+        app.listeners['before_server_start'].extend([build_spec, create_clients])
+        time_listeners(app)
+        # started twice, e.g. by the test client
+        time_listeners(app)
+        loop = asyncio.new_event_loop()
+        for listener in app.listeners['before_server_start']:
+            result = listener(app, loop)
+            if result is not None:
+                loop.run_until_complete(result)
+        loop.close()
+        self.assertEqual([name for name, seconds in timings],
+                         ['listener build_spec', 'listener create_clients'])
+
+
+if __name__ == '__main__':
+    unittest.main()
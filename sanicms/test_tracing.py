@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import opentracing
+
+from basictracer.text_propagator import TextPropagator
+
+from sanicms.client import ClientSessionConn
+from sanicms.tracing import Tracer, recycle
+
+
+class ListRecorder:
+
+    def __init__(self):
+        self.spans = []
+
+    def record_span(self, span):
+        self.spans.append(span)
+
+
+class SpanPoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.recorder = ListRecorder()
+        self.tracer = Tracer(recorder=self.recorder)
+
+    def test_finish_twice(self):
+        span = self.tracer.start_span('req')
+        span.finish()
+        span.finish()
+        self.assertEqual(len(self.recorder.spans), 1)
+        for recorded in self.recorder.spans:
+            recycle(recorded)
+        recycle(span)
+        self.assertIsNot(self.tracer.start_span('req-a'), self.tracer.start_span('req-b'))
+
+    def test_unfinished_not_pooled(self):
+        span = self.tracer.start_span('req')
+        recycle(span)
+        self.assertIsNot(self.tracer.start_span('req-a'), span)
+
+    def test_reused(self):
+        span = self.tracer.start_span('req')
+        span.set_tag('http.path', '/users/1')
+        span.finish()
+        recycle(span)
+        reused = self.tracer.start_span('req-a')
+        self.assertIs(reused, span)
+        self.assertEqual(reused.tags, {})
+        reused.finish()
+        self.assertEqual(len(self.recorder.spans), 2)
+
+
+class Session:
+
+    def __init__(self):
+        self.headers = []
+
+    def request(self, method, url, headers=None, **kwargs):
+        self.headers.append(headers)
+
+
+class ClientSpanTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.recorder = ListRecorder()
+        self.tracer = opentracing.tracer = Tracer(recorder=self.recorder)
+        self.tracer.register_propagator(opentracing.Format.HTTP_HEADERS, TextPropagator())
+
+    def tearDown(self):
+        opentracing.tracer = opentracing.Tracer()
+
+    def test_span_per_call(self):
+        parent = self.tracer.start_span('req')
+        conn = ClientSessionConn(Session(), url='http://users', span=parent)
+        conn.get('/users/1')
+        conn.get('/users/2')
+        spans = self.recorder.spans
+        self.assertEqual([span.get_tag('http.path') for span in spans], ['/users/1', '/users/2'])
+        self.assertIsNot(spans[0], spans[1])
+        self.assertEqual({span.parent_id for span in spans}, {parent.span_id})
+
+
+if __name__ == '__main__':
+    unittest.main()
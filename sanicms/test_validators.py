@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import unittest
+
+from datetime import date, datetime, time, timedelta, timezone
+
+from sanicms import doc, testing
+from sanicms.exception import UnprocessableEntity
+from sanicms.request import DATA_METHODS
+from sanicms.validators import (compile_schema, validate_request, validators,
+                                partial_validators, to_date, to_datetime, to_time,
+                                ValidationError)
+
+
+class User:
+    name = doc.String(required=True)
+    age = doc.Integer(required=True)
+    birthday = doc.Date()
+    created = doc.DateTime()
+
+
+async def update_user(request, id):
+    pass
+
+
+def make_request(method, data):
+    return testing.make_request(method, '/users/1', update_user, data=data)
+
+
+class CoerceTestCase(unittest.TestCase):
+
+    def test_coerce(self):
+        validator = compile_schema(User)
+        data = validator({'name': 'test', 'age': '2', 'birthday': '2018-01-02',
+                          'created': '2018-01-02T03:04:05Z', 'extra': 1})
+        self.assertEqual(data['age'], 2)
+        self.assertEqual(data['birthday'], date(2018, 1, 2))
+        self.assertEqual(data['created'], datetime(2018, 1, 2, 3, 4, 5, tzinfo=timezone.utc))
+        self.assertEqual(data['extra'], 1)
+
+    def test_errors(self):
+        validator = compile_schema(User)
+        with self.assertRaises(ValidationError) as cm:
+            validator({'age': 'two', 'created': 'yesterday'})
+        self.assertEqual(cm.exception.errors, {
+            'name': 'required', 'age': 'expected integer',
+            'created': 'expected ISO 8601 date-time'})
+
+    def test_partial(self):
+        self.assertEqual(compile_schema(User, partial=True)({'age': '3'}), {'age': 3})
+
+    def test_isoformat(self):
+        tz = timezone(timedelta(hours=8))
+        self.assertEqual(to_datetime('2018-01-02 03:04:05.123+08:00'),
+                         datetime(2018, 1, 2, 3, 4, 5, 123000, tzinfo=tz))
+        self.assertEqual(to_datetime('2018-01-02'), datetime(2018, 1, 2))
+        self.assertEqual(to_time('03:04'), time(3, 4))
+        self.assertEqual(to_time('03:04:05+08:00'), time(3, 4, 5, tzinfo=tz))
+        with self.assertRaises(ValueError):
+            to_date('2018-13-01')
+        with self.assertRaises(ValueError):
+            to_date(20180101)
+
+
+class ValidateRequestTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        validators[update_user] = compile_schema(User)
+        partial_validators[update_user] = compile_schema(User, partial=True)
+
+    def tearDown(self):
+        self.loop.close()
+        validators.pop(update_user, None)
+        partial_validators.pop(update_user, None)
+
+    def test_patch(self):
+        self.assertIn('PATCH', DATA_METHODS)
+        request = make_request('PATCH', {'age': '3'})
+        self.loop.run_until_complete(validate_request(request))
+        self.assertEqual(request['data'], {'age': 3})
+
+    def test_put_required(self):
+        request = make_request('PUT', {'age': '3'})
+        with self.assertRaises(UnprocessableEntity):
+            self.loop.run_until_complete(validate_request(request))
+
+    def test_body_required(self):
+        with self.assertRaises(UnprocessableEntity):
+            self.loop.run_until_complete(validate_request(make_request('POST', None)))
+
+
+if __name__ == '__main__':
+    unittest.main()
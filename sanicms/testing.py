@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from types import SimpleNamespace
+
+from sanicms.routes import RouteMeta
+
+
+class FakeRequest(dict):
+    """
+    Stand-in for sanicms.request.Request in unit tests of the middleware
+    pieces that don't need a server
+    """
+
+    def __init__(self, method='GET', path='/', query_string='', headers=None, app=None):
+        super().__init__()
+        self.method = method
+        self.path = path
+        self.query_string = query_string
+        self.headers = headers or {}
+        self.app = app
+
+    async def load_data(self):
+        return self.get('data')
+
+
+def make_request(method='GET', path='/', handler=None, blueprint=None, uri=None,
+                 headers=None, config=None, app=None, **items):
+    """
+    FakeRequest already routed to `handler` when given, `items` are set
+    as request[key]
+    """
+    request = FakeRequest(method, path, headers=headers,
+                          app=app or SimpleNamespace(config=config or {}))
+    if handler is not None:
+        request['route'] = RouteMeta(handler, uri=uri, blueprint=blueprint)
+    request.update(items)
+    return request
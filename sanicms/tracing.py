@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import random
+import opentracing
+
+from opentracing.ext import tags as ext_tags
+from basictracer import BasicTracer
+from basictracer.util import generate_id
+
+# Spans of unsampled requests. The no-op span ignores tags and logs and is
+# never recorded, so nothing reaches the trace queue.
+noop_span = opentracing.Tracer().start_span()
+
+SAMPLED_HEADERS = ('ot-tracer-sampled', 'x-b3-sampled')
+
+# only requests carrying the trace id need the propagator
+TRACE_HEADER = 'ot-tracer-traceid'
+
+
+def is_sampled(span):
+    return span is not None and span is not noop_span
+
+
+def start_span(operation_name, child_of=None):
+    """
+    Start a child span, unsampled parents get the no-op span back
+    """
+    if child_of is noop_span:
+        return noop_span
+    return opentracing.tracer.start_span(operation_name=operation_name,
+                                         child_of=child_of)
+
+
+class Sampler:
+    """
+    Head-based sampler. An upstream decision carried in the request headers
+    always wins, otherwise the route rate (keyed by handler name) or the
+    default rate is used.
+    """
+
+    def __init__(self, rate=1.0, routes=None):
+        self.rate = rate
+        self.routes = routes or {}
+
+    def upstream(self, headers):
+        for header in SAMPLED_HEADERS:
+            value = headers.get(header)
+            if value is not None:
+                return value.lower() in ('true', '1')
+        return None
+
+    def rate_for(self, operation_name):
+        return self.routes.get(operation_name, self.rate)
+
+    def decide(self, rate, headers):
+        decision = self.upstream(headers)
+        if decision is not None:
+            return decision
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    def sampled(self, operation_name, headers):
+        return self.decide(self.rate_for(operation_name), headers)
+
+
+# Tags set on (nearly) every span get a fixed slot instead of a dict entry
+TAG_KEYS = (
+    'component', 'span.kind', 'http.url', 'http.path', 'http.method',
+    'http.status_code', 'peer.ipv4', 'db.type', 'db.sql', 'args',
+    'error.kind', 'error.msg',
+)
+TAG_INDEX = {key: index for index, key in enumerate(TAG_KEYS)}
+
+_unset = object()
+_unset_tags = (_unset,) * len(TAG_KEYS)
+
+
+class SpanLog:
+    __slots__ = ('key_values', 'timestamp')
+
+    def __init__(self, key_values, timestamp):
+        self.key_values = key_values
+        self.timestamp = timestamp
+
+
+class Span:
+    """
+    Slotted span that is also its own span context. Instances are pooled
+    by the Tracer and handed out again once the reporter released them.
+    """
+    __slots__ = ('_tracer', 'operation_name', 'start_time', 'duration',
+                 'trace_id', 'span_id', 'parent_id', 'sampled', '_baggage',
+                 '_values', '_extra', 'logs', '_pooled')
+
+    def __init__(self, tracer):
+        self._tracer = tracer
+        self._pooled = False
+        self._values = list(_unset_tags)
+        self._extra = None
+        self._baggage = None
+        self.logs = []
+
+    @property
+    def context(self):
+        return self
+
+    @property
+    def tracer(self):
+        return self._tracer
+
+    @property
+    def baggage(self):
+        return self._baggage or opentracing.SpanContext.EMPTY_BAGGAGE
+
+    @property
+    def tags(self):
+        tags = {key: value for key, value in zip(TAG_KEYS, self._values)
+                if value is not _unset}
+        if self._extra:
+            tags.update(self._extra)
+        return tags
+
+    def get_tag(self, key, default=None):
+        index = TAG_INDEX.get(key)
+        if index is not None:
+            value = self._values[index]
+            return default if value is _unset else value
+        if self._extra:
+            return self._extra.get(key, default)
+        return default
+
+    def set_tag(self, key, value):
+        index = TAG_INDEX.get(key)
+        if index is not None:
+            self._values[index] = value
+        else:
+            if key == ext_tags.SAMPLING_PRIORITY:
+                self.sampled = value > 0
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+        return self
+
+    def set_operation_name(self, operation_name):
+        self.operation_name = operation_name
+        return self
+
+    def log_kv(self, key_values, timestamp=None):
+        self.logs.append(SpanLog(key_values, time.time() if timestamp is None else timestamp))
+        return self
+
+    def log_event(self, event, payload=None):
+        return self.log_kv({'event': event, 'payload': payload})
+
+    def log(self, **kwargs):
+        return self.log_kv(kwargs, kwargs.get('timestamp'))
+
+    def set_baggage_item(self, key, value):
+        baggage = dict(self.baggage)
+        baggage[key] = value
+        self._baggage = baggage
+        return self
+
+    def get_baggage_item(self, key):
+        return self.baggage.get(key)
+
+    def finish(self, finish_time=None):
+        # recorded twice it would be pooled twice and shared by two requests
+        if self.duration >= 0 or self._pooled:
+            return
+        finish = time.time() if finish_time is None else finish_time
+        self.duration = finish - self.start_time
+        self._tracer.record(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type:
+            self.set_tag(ext_tags.ERROR, True)
+        self.finish()
+
+    def _reset(self):
+        self._values[:] = _unset_tags
+        self._extra = None
+        self._baggage = None
+        self.logs.clear()
+
+
+class Tracer(BasicTracer):
+    """
+    BasicTracer compatible tracer creating pooled slotted spans. Spans are
+    recycled with `release` after they were serialized, at most
+    `pool_size` idle spans are kept (0 disables reuse). Scope managers
+    are not supported, parents must be passed explicitly.
+    """
+
+    def __init__(self, recorder=None, sampler=None, pool_size=1024):
+        super().__init__(recorder=recorder, sampler=sampler)
+        self._pool = []
+        self._pool_size = pool_size
+
+    def start_span(self, operation_name=None, child_of=None, references=None,
+                   tags=None, start_time=None, ignore_active_span=False):
+        parent = child_of
+        if parent is None and references:
+            if isinstance(references, opentracing.Reference):
+                references = [references]
+            parent = references[0].referenced_context
+        if parent is not None and not hasattr(parent, 'trace_id'):
+            parent = parent.context
+        span = self._pool.pop() if self._pool else Span(self)
+        span._pooled = False
+        span.operation_name = operation_name
+        span.start_time = time.time() if start_time is None else start_time
+        span.duration = -1
+        span.span_id = generate_id()
+        if parent is not None:
+            span.trace_id = parent.trace_id
+            span.parent_id = parent.span_id
+            span.sampled = parent.sampled
+            if parent.baggage:
+                span._baggage = dict(parent.baggage)
+        else:
+            span.trace_id = generate_id()
+            span.parent_id = None
+            span.sampled = self.sampler.sampled(span.trace_id)
+        if tags:
+            for key, value in tags.items():
+                span.set_tag(key, value)
+        return span
+
+    def release(self, span):
+        if span._pooled or span.duration < 0:
+            return
+        if len(self._pool) < self._pool_size:
+            span._reset()
+            span._pooled = True
+            self._pool.append(span)
+
+
+def span_tag(span, key, default=None):
+    if isinstance(span, Span):
+        return span.get_tag(key, default)
+    return span.tags.get(key, default)
+
+
+def recycle(span):
+    """
+    Give a span that is no longer referenced back to its tracer's pool
+    """
+    if isinstance(span, Span):
+        span._tracer.release(span)
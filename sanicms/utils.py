@@ -3,13 +3,18 @@
 
 import json
 import logging
+import functools
 import asyncio
-import aiohttp
 import opentracing
 
 from sanic.handlers import ErrorHandler
+from sanic.response import json as json_response
 from opentracing.ext import tags
-from sanicms.exception import CustomException
+from sanicms.exception import CustomException, GatewayTimeout
+from sanicms.tracing import noop_span, recycle, TRACE_HEADER
+from sanicms.spool import replay
+from sanicms.routes import get_route
+from sanicms.deadline import deadline_exceeded
 
 logger = logging.getLogger('sanic')
 _log = logging.getLogger('zipkin')
@@ -37,72 +42,230 @@ def id_to_hex(id):
         return None
     return '{0:x}'.format(id)
 
-async def consume(q, app):
-    zs = app.config['ZIPKIN_SERVER']
-    async with aiohttp.ClientSession() as session:
-        while True:
-            # wait for an item from the producer
+def span_to_record(span):
+    """
+    Convert a finished span into a zipkin v1 span dict
+    """
+    annotations = []
+    binary_annotations = []
+    tags = span.tags
+    service_name = tags.get('component')
+    endpoint = {'serviceName': service_name if service_name else 'service'}
+    for k, v in tags.items():
+        if k == 'component':
+            continue
+        binary_annotations.append({
+            'endpoint': endpoint,
+            'key': k,
+            'value': v
+        })
+    start_time = int(span.start_time*1000000)
+    duration = int(span.duration*1000000)
+    for log in span.logs:
+        event = log.key_values.get('event') or ''
+        payload = log.key_values.get('payload')
+        an = {}
+        if event == 'client':
+            an = {'cs': start_time,
+                'cr': start_time + duration}
+        elif event == 'server':
+            an = {'sr': start_time,
+                'ss': start_time + duration}
+        else:
+            binary_annotations.append({
+                'endpoint': endpoint,
+                'key': "%s@%s" % (event, str(log.timestamp)),
+                'value': payload
+            })
+        for k, v in an.items():
+            annotations.append({
+                'endpoint': endpoint,
+                'timestamp': v,
+                'value': k
+            })
+    return create_span(
+        id_to_hex(span.context.span_id),
+        id_to_hex(span.parent_id),
+        id_to_hex(span.context.trace_id),
+        span.operation_name,
+        start_time,
+        duration,
+        annotations,
+        binary_annotations,
+    )
+
+_endpoints = {}
+
+def span_to_record_v2(span):
+    """
+    Convert a finished span into a zipkin v2 span dict: flat string tags,
+    the span kind and a single shared localEndpoint
+    """
+    tags = span.tags
+    service_name = tags.get('component') or 'service'
+    endpoint = _endpoints.get(service_name)
+    if endpoint is None:
+        endpoint = _endpoints[service_name] = {'serviceName': service_name}
+    start_time = int(span.start_time*1000000)
+    record = {
+        'traceId': id_to_hex(span.context.trace_id),
+        'id': id_to_hex(span.context.span_id),
+        'name': span.operation_name,
+        'timestamp': start_time,
+        'duration': int(span.duration*1000000),
+        'localEndpoint': endpoint,
+    }
+    if span.parent_id is not None:
+        record['parentId'] = id_to_hex(span.parent_id)
+    annotations = None
+    for log in span.logs:
+        event = log.key_values.get('event') or ''
+        if event == 'client':
+            record['kind'] = 'CLIENT'
+        elif event == 'server':
+            record['kind'] = 'SERVER'
+        else:
+            if annotations is None:
+                annotations = record['annotations'] = []
+            annotations.append({
+                'timestamp': int(log.timestamp*1000000),
+                'value': '{}:{}'.format(event, log.key_values.get('payload'))
+            })
+    record['tags'] = {k: str(v) for k, v in tags.items()
+                      if k != 'component' and k != 'span.kind'}
+    return record
+
+ENCODINGS = {
+    'v1': span_to_record,
+    'v2': span_to_record_v2,
+}
+
+def encode_spans(records):
+    """
+    Serialize a batch of span records into a single JSON body
+    """
+    return json.dumps(records, separators=(',', ':')).encode('utf-8')
+
+async def collect_spans(q, batch, size, interval):
+    """
+    Wait for the first span, then gather up to `size` spans into `batch`
+    or until `interval` seconds have passed, whichever comes first
+    """
+    batch.append(await q.get())
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + interval
+    while len(batch) < size:
+        if q.empty():
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
             try:
-                span = await q.get()
-                annotations = []
-                binary_annotations = []
-                annotation_filter = set()
-                service_name = span.tags.pop('component') if 'component' in span.tags else None
-                endpoint = {'serviceName': service_name if service_name else 'service'}
-                if span.tags:
-                    for k, v in span.tags.items():
-                        binary_annotations.append({
-                            'endpoint': endpoint,
-                            'key': k,
-                            'value': v
-                        })
-                for log in span.logs:
-                    event = log.key_values.get('event') or ''
-                    payload = log.key_values.get('payload')
-                    an = []
-                    start_time = int(span.start_time*1000000)
-                    duration = int(span.duration*1000000)
-                    if event == 'client':
-                        an = {'cs': start_time,
-                            'cr': start_time + duration}
-                    elif event == 'server':
-                        an = {'sr': start_time,
-                            'ss': start_time + duration}
-                    else:
-                        binary_annotations["%s@%s" % (event, str(log.timestamp))] = payload
-                    for k, v in an.items():
-                        annotations.append({
-                            'endpoint': endpoint,
-                            'timestamp': v,
-                            'value': k
-                        })
-                span_record = create_span(
-                    id_to_hex(span.context.span_id),
-                    id_to_hex(span.parent_id),
-                    id_to_hex(span.context.trace_id),
-                    span.operation_name,
-                    start_time,
-                    duration,
-                    annotations,
-                    binary_annotations,
-                )
-                if zs:
-                    async with session.post(zs, json=[span_record]) as res:
-                        logger.info(await res.text())
-                _log.info("{} span".format(service_name), span_record)
-                q.task_done()
-            except RuntimeError as e:
-                logger.errro(e)
+                batch.append(await asyncio.wait_for(q.get(), timeout))
+            except asyncio.TimeoutError:
                 break
+        else:
+            batch.append(q.get_nowait())
+
+async def send_spans(session, zs, payload, timeout=None):
+    try:
+        async with session.post(zs, data=payload, timeout=timeout,
+                                headers={'Content-Type': 'application/json'}) as res:
+            logger.debug(await res.text())
+            if res.status >= 500:
+                logger.error("send spans to {} failed: {}".format(zs, res.status))
+                return False
+            return True
+    except Exception as e:
+        logger.error("send spans to {} failed: {}".format(zs, e))
+        return False
+
+async def consume(q, app):
+    """
+    Export spans from the queue in batches of ZIPKIN_BATCH_SIZE spans or
+    every ZIPKIN_FLUSH_INTERVAL seconds, with at most ZIPKIN_MAX_INFLIGHT
+    concurrent POSTs. Cancel the task to flush what is left and stop.
+    ZIPKIN_ENCODING selects the v1 (default) or v2 span model.
+
+    With ZIPKIN_SPOOL_PATH set, batches that fail to export are written to
+    a disk spool (app.spool) and replayed at ZIPKIN_SPOOL_REPLAY_RATE
+    batches per second once the server accepts them again.
+    """
+    # imported here to keep it off the sanicms.server import path
+    import aiohttp
+    zs = app.config.get('ZIPKIN_SERVER')
+    to_record = ENCODINGS[app.config.get('ZIPKIN_ENCODING', 'v1')]
+    timeout = app.config.get('ZIPKIN_TIMEOUT', 5)
+    spool = getattr(app, 'spool', None)
+    batch_size = app.config.get('ZIPKIN_BATCH_SIZE', 500)
+    interval = app.config.get('ZIPKIN_FLUSH_INTERVAL', 0.2)
+    inflight = asyncio.Semaphore(app.config.get('ZIPKIN_MAX_INFLIGHT', 4))
+    loop = asyncio.get_event_loop()
+    pending = set()
+
+    async def export(batch):
+        # wait for a send slot before touching the batch so a cancellation
+        # here leaves it intact for the final flush
+        if zs:
+            await inflight.acquire()
+        records = []
+        for span in batch:
+            try:
+                records.append(to_record(span))
             except Exception as e:
                 logger.error("{}".format(e))
-                raise e
-            finally:
-                pass
+            recycle(span)
+        if _log.isEnabledFor(logging.INFO):
+            for record in records:
+                _log.info("{} span".format(record['name']), record)
+        if zs and records:
+            task = loop.create_task(send(encode_spans(records)))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            task.add_done_callback(lambda t: inflight.release())
+        elif zs:
+            inflight.release()
+        for _ in batch:
+            q.task_done()
+
+    async def send(payload):
+        sent = await send_spans(session, zs, payload, timeout=timeout)
+        if not sent and spool:
+            spool.append(payload)
+        return sent
+
+    async with aiohttp.ClientSession() as session:
+        replayer = None
+        if zs and spool:
+            replayer = loop.create_task(replay(
+                spool, functools.partial(send_spans, session, zs, timeout=timeout),
+                rate=app.config.get('ZIPKIN_SPOOL_REPLAY_RATE', 5),
+                retry=app.config.get('ZIPKIN_SPOOL_RETRY', 5)))
+        batch = []
+        try:
+            while True:
+                await collect_spans(q, batch, batch_size, interval)
+                await export(batch)
+                batch = []
+        except asyncio.CancelledError:
+            while not q.empty():
+                batch.append(q.get_nowait())
+                if len(batch) >= batch_size:
+                    await export(batch)
+                    batch = []
+            if batch:
+                await export(batch)
+        finally:
+            if replayer:
+                replayer.cancel()
+            if pending:
+                await asyncio.wait(pending)
 
 class CustomHandler(ErrorHandler):
 
     def default(self, request, exception):
+        if isinstance(exception, asyncio.CancelledError) and request is not None \
+                and deadline_exceeded(request):
+            exception = GatewayTimeout(message='Deadline exceeded')
         if isinstance(exception, CustomException):
             data = {
                 'message': exception.message,
@@ -110,25 +273,34 @@ class CustomHandler(ErrorHandler):
             }
             if exception.error:
                 data.update({'error': exception.error})
-            span = request['span']
-            span.set_tag('http.status_code', str(exception.status_code))
-            span.set_tag('error.kind', exception.__class__.__name__)
-            span.set_tag('error.msg', exception.message)
-            return json.dumps(data, status=exception.status_code)
+            span = request.get('span')
+            if span:
+                span.set_tag('http.status_code', str(exception.status_code))
+                span.set_tag('error.kind', exception.__class__.__name__)
+                span.set_tag('error.msg', exception.message)
+            return json_response(data, status=exception.status_code,
+                                 headers=exception.headers)
         return super().default(request, exception)
 
 def before_request(request):
-    try:
-        span_context = opentracing.tracer.extract(
-            format=opentracing.Format.HTTP_HEADERS,
-            carrier=request.headers
-        )
-    except Exception as e:
-        span_context = None
-    handler = request.app.router.get(request)
-    span = opentracing.tracer.start_span(operation_name=handler[0].__name__,
+    route = get_route(request)
+    if not request.app.sampler.decide(route.sample_rate, request.headers):
+        return noop_span
+    span_context = None
+    if TRACE_HEADER in request.headers:
+        try:
+            span_context = opentracing.tracer.extract(
+                format=opentracing.Format.HTTP_HEADERS,
+                carrier=request.headers
+            )
+        except Exception as e:
+            span_context = None
+    span = opentracing.tracer.start_span(operation_name=route.name,
                              child_of=span_context)
     span.log_kv({'event': 'server'})
+    span.set_tag(tags.SPAN_KIND, tags.SPAN_KIND_RPC_SERVER)
+    for key, value in route.tags.items():
+        span.set_tag(key, value)
     span.set_tag('http.url', request.url)
     span.set_tag('http.method', request.method)
     ip = request.ip
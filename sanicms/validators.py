@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+import uuid
+import decimal
+import logging
+
+from datetime import date, datetime, time
+from itertools import repeat
+
+from sanic.views import CompositionView
+
+from sanicms import doc
+from sanicms.doc import route_specs, is_model, is_array_field
+from sanicms.exception import UnprocessableEntity
+from sanicms.routes import get_route
+
+logger = logging.getLogger('sanic')
+
+BODY_METHODS = ('POST', 'PUT', 'PATCH')
+
+# handler -> compiled validator of its doc.consumes schema
+validators = {}
+
+# handler -> validator for PATCH, top level fields are all optional
+partial_validators = {}
+
+_missing = object()
+
+
+class ValidationError(ValueError):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+# --------------------------------------------------------------- #
+# Coercers
+# --------------------------------------------------------------- #
+
+def to_int(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    raise ValueError('expected integer')
+
+
+def to_float(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    raise ValueError('expected number')
+
+
+def to_decimal(value):
+    if isinstance(value, (int, float, str)) and not isinstance(value, bool):
+        try:
+            return decimal.Decimal(str(value))
+        except decimal.InvalidOperation:
+            pass
+    raise ValueError('expected number')
+
+
+def to_bool(value):
+    if isinstance(value, bool):
+        return value
+    if value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.lower() in ('true', 'false'):
+        return value.lower() == 'true'
+    raise ValueError('expected boolean')
+
+
+def to_str(max_length=None):
+    def coerce(value):
+        if not isinstance(value, str):
+            raise ValueError('expected string')
+        if max_length and len(value) > max_length:
+            raise ValueError('longer than {} characters'.format(max_length))
+        return value
+    return coerce
+
+
+ISO_DATE = ('%Y-%m-%d',)
+ISO_TIME = ('%H:%M:%S.%f%z', '%H:%M:%S%z', '%H:%M%z', '%H:%M:%S.%f', '%H:%M:%S', '%H:%M')
+ISO_DATETIME = ISO_DATE + tuple('%Y-%m-%d{}{}'.format(sep, fmt)
+                                for sep in 'T ' for fmt in ISO_TIME)
+
+
+def _isoformat(cls, formats, convert, name):
+    """
+    ISO 8601 parser with strptime, date/datetime.fromisoformat are only
+    in python 3.7 and %z doesn't accept '+08:00' before it
+    """
+    def coerce(value):
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, str):
+            value = re.sub(r'([+-]\d\d):(\d\d)$', r'\1\2', re.sub(r'Z$', '+0000', value))
+            for fmt in formats:
+                try:
+                    return convert(datetime.strptime(value, fmt))
+                except ValueError:
+                    pass
+        raise ValueError('expected ISO 8601 {}'.format(name))
+    return coerce
+
+
+to_datetime = _isoformat(datetime, ISO_DATETIME, lambda value: value, 'date-time')
+to_date = _isoformat(date, ISO_DATE, datetime.date, 'date')
+to_time = _isoformat(time, ISO_TIME, datetime.timetz, 'time')
+
+
+def to_uuid(value):
+    if isinstance(value, uuid.UUID):
+        return value
+    try:
+        return uuid.UUID(value)
+    except (TypeError, ValueError, AttributeError):
+        raise ValueError('expected uuid')
+
+
+def to_dict(value):
+    if not isinstance(value, dict):
+        raise ValueError('expected object')
+    return value
+
+
+def to_list(items=None):
+    def coerce(value):
+        if not isinstance(value, list):
+            raise ValueError('expected array')
+        if items is None:
+            return value
+        errors = {}
+        for index, item in enumerate(value):
+            try:
+                value[index] = items(item)
+            except ValidationError as e:
+                errors[index] = e.errors
+            except ValueError as e:
+                errors[index] = str(e)
+        if errors:
+            raise ValidationError(errors)
+        return value
+    return coerce
+
+
+def passthrough(value):
+    return value
+
+
+def to_object(fields):
+    """
+    `fields` is a tuple of (key, coerce, required); unknown keys are kept
+    """
+    def coerce(data):
+        if not isinstance(data, dict):
+            raise ValueError('expected object')
+        errors = None
+        for key, field, required in fields:
+            value = data.get(key, _missing)
+            if value is _missing or value is None:
+                if required:
+                    errors = errors or {}
+                    errors[key] = 'required'
+                continue
+            try:
+                data[key] = field(value)
+            except ValidationError as e:
+                errors = errors or {}
+                errors[key] = e.errors
+            except ValueError as e:
+                errors = errors or {}
+                errors[key] = str(e)
+        if errors:
+            raise ValidationError(errors)
+        return data
+    return coerce
+
+
+# --------------------------------------------------------------- #
+# Schema compilers, mirroring doc.serialize_schema
+# --------------------------------------------------------------- #
+
+SCALARS = {
+    int: to_int,
+    float: to_float,
+    str: to_str(),
+    bool: to_bool,
+    date: to_date,
+    datetime: to_datetime,
+    dict: to_dict,
+    list: to_list(),
+}
+
+DOC_FIELDS = {
+    doc.Integer: to_int,
+    doc.String: to_str(),
+    doc.Boolean: to_bool,
+    doc.Date: to_date,
+    doc.DateTime: to_datetime,
+}
+
+DB_FIELDS = {
+    'INT': to_int, 'BIGINT': to_int, 'SMALLINT': to_int,
+    'AUTO': to_int, 'BIGAUTO': to_int,
+    'FLOAT': to_float, 'DOUBLE': to_float, 'DECIMAL': to_decimal,
+    'UUID': to_uuid, 'DATETIME': to_datetime, 'DATE': to_date,
+    'TIME': to_time, 'BOOL': to_bool,
+}
+
+
+def compile_peewee_field(field):
+    from peewee import ForeignKeyField
+    if is_array_field(field):
+        return to_list()
+    if isinstance(field, ForeignKeyField):
+        return to_int
+    db_field = field.field_type
+    if db_field in ('VARCHAR', 'CHAR', 'TEXT', 'DEFAULT'):
+        return to_str(getattr(field, 'max_length', None))
+    return DB_FIELDS.get(db_field, passthrough)
+
+
+def compile_peewee(model, partial=False):
+    fields = []
+    for name, field in model._meta.fields.items():
+        required = not (partial or field.null or field.primary_key or field.default is not None)
+        fields.append((field.column_name or name, compile_peewee_field(field), required))
+    return to_object(tuple(fields))
+
+
+def compile_class(cls, partial=False):
+    fields = []
+    for key, schema in cls.__dict__.items():
+        if key.startswith('_'):
+            continue
+        required = bool(getattr(schema, 'required', False)) \
+            if isinstance(schema, doc.Field) and not partial else False
+        fields.append((key, compile_schema(schema), required))
+    return to_object(tuple(fields))
+
+
+def compile_schema(schema, partial=False):
+    """
+    With `partial` the top level fields are optional, as for PATCH bodies
+    """
+    schema_type = type(schema)
+    if schema_type is type:
+        if schema in SCALARS:
+            return SCALARS[schema]
+        if schema in DOC_FIELDS:
+            return DOC_FIELDS[schema]
+        if issubclass(schema, doc.Field):
+            return passthrough
+        return compile_class(schema, partial)
+    if is_model(schema_type):
+        return compile_peewee(schema, partial)
+    if isinstance(schema, doc.Dictionary):
+        return compile_schema(schema.fields, partial)
+    if isinstance(schema, doc.List):
+        return to_list(compile_schema(schema.items[0]) if len(schema.items) == 1 else None)
+    if isinstance(schema, (doc.Object, doc.PeeweeObject)):
+        return compile_schema(schema.cls, partial)
+    if isinstance(schema, doc.Field):
+        return DOC_FIELDS.get(schema_type, passthrough)
+    if schema_type is dict:
+        return to_object(tuple((key, compile_schema(value), False)
+                               for key, value in schema.items()))
+    if schema_type is list:
+        return to_list(compile_schema(schema[0]) if len(schema) == 1 else None)
+    return passthrough
+
+
+# --------------------------------------------------------------- #
+# Startup & request hooks
+# --------------------------------------------------------------- #
+
+def build_validators(app, loop):
+    for uri, route in app.router.routes_all.items():
+        if isinstance(route.handler, CompositionView):
+            method_handlers = route.handler.handlers.items()
+        else:
+            method_handlers = zip(route.methods, repeat(route.handler))
+        for _method, _handler in method_handlers:
+            if _method not in BODY_METHODS:
+                continue
+            partial = _method == 'PATCH'
+            table = partial_validators if partial else validators
+            if _handler in table:
+                continue
+            route_spec = route_specs.get(_handler)
+            if route_spec is None or route_spec.consumes is None:
+                continue
+            try:
+                table[_handler] = compile_schema(route_spec.consumes, partial)
+            except Exception as e:
+                logger.error('compile validator for {} failed: {}'.format(uri, e))
+
+
+async def validate_request(request):
+    """
+    Validate and coerce request['data'] against the route's consumes
+    schema, large bodies are parsed in the executor by load_data
+    """
+    if request.method not in BODY_METHODS:
+        return
+    table = partial_validators if request.method == 'PATCH' else validators
+    validator = table.get(get_route(request).handler)
+    if validator is None:
+        return
+    data = await request.load_data()
+    if data is None:
+        raise UnprocessableEntity(message='Request body required')
+    try:
+        request['data'] = validator(data)
+    except ValidationError as e:
+        raise UnprocessableEntity(error=e.errors, message='Invalid request data')
+    except ValueError as e:
+        raise UnprocessableEntity(error=str(e), message='Invalid request data')